@@ -9,7 +9,7 @@ Stable surface:
 # Re-export selected items so users can: `from hida import X`
 
 from .core import parse
-from .data_helpers import validate_definitions, find_type_by_name
+from .data_helpers import validate_definitions, find_type_by_name, index_by_name
 from .data import *
 from .manipulate import (
     filter_by_source_regexes,
@@ -17,6 +17,7 @@ from .manipulate import (
     get_system_include_regexes,
     fill_bitfield_holes_with_padding,
     fill_struct_holes_with_padding_bytes,
+    reorder_fields_min_padding,
     flatten_namespaces,
     resolve_typedefs,
     filter_connected_definitions,
@@ -41,12 +42,14 @@ __all__ = [
     # data_helpers
     "validate_definitions",
     "find_type_by_name",
+    "index_by_name",
     # manipulate
     "filter_by_source_regexes",
     "get_system_include_regexes",
     "filter_by_name_regexes",
     "fill_bitfield_holes_with_padding",
     "fill_struct_holes_with_padding_bytes",
+    "reorder_fields_min_padding",
     "flatten_namespaces",
     "resolve_typedefs",
     "filter_connected_definitions",
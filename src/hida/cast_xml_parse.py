@@ -1,9 +1,34 @@
+import re
 import xml.etree.ElementTree as ET
 from pathlib import Path
+
+try:  # optional C parser (the `fast` extra); ElementTree is the fallback
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
+
 from .data import *
 from .manipulate import *
+from .manipulate import _any_search
 from . import data_helpers
 
+_PARSE_ERRORS = (ET.ParseError,) + (
+    (lxml_etree.XMLSyntaxError,) if lxml_etree is not None else ()
+)
+
+_INTEGRAL_WIDTHS = {
+    8: "int8_t",
+    16: "int16_t",
+    32: "int32_t",
+    64: "int64_t",
+    128: "int128_t",
+}
+
+# Element tags that _parse turns into definitions
+_DEFINITION_TAGS = frozenset(
+    ("Struct", "Class", "Typedef", "Enumeration", "Union", "Variable")
+)
+
 
 class CastXmlParse:
     CHAR_BITS = 8  # Number of bits in a byte (standard for most platforms)
@@ -15,15 +40,22 @@ class CastXmlParse:
         do_not_ignore_system=False,
         remove_unknown=True,
         verbose=False,
+        exclude_sources=None,
     ):
         """
         Initialize the parser with an optional configuration dictionary.
+
+        `exclude_sources` (regex patterns, as for filter_by_source_regexes) prunes
+        declarations by source location before they are parsed. Pruned declarations
+        never become definitions: they do not count as known types for
+        `remove_unknown`, and their parse errors are never raised.
         """
         self.use_bool = use_bool
         self.skip_failed_parsing = skip_failed_parsing
         self.do_not_ignore_system = do_not_ignore_system
         self.remove_unknown = remove_unknown
         self.verbose = verbose
+        self.exclude_sources = exclude_sources
         self.xml_root = None
         self.data = None  # This will hold parsed data after _parse
 
@@ -33,9 +65,9 @@ class CastXmlParse:
         Returns a list of parsed class definitions.
         """
         try:
-            tree = ET.parse(xml_path)
+            tree = self._load_tree(xml_path)
             self.xml_root = tree.getroot()
-        except ET.ParseError as e:
+        except _PARSE_ERRORS as e:
             raise ET.ParseError(f"Failed to parse XML file '{xml_path}': {e}") from e
 
         try:
@@ -50,6 +82,16 @@ class CastXmlParse:
             )
         return self.data
 
+    @staticmethod
+    def _load_tree(xml_path):
+        """Parse the file with lxml when installed, else with ElementTree."""
+        if lxml_etree is None:
+            return ET.parse(xml_path)
+        parser = lxml_etree.XMLParser(
+            huge_tree=True, collect_ids=False, remove_comments=True, remove_pis=True
+        )
+        return lxml_etree.parse(str(xml_path), parser)
+
     @staticmethod
     def _normalize_integral_type(
         typename: str, size_in_bits: int, use_bool=False
@@ -73,14 +115,7 @@ class CastXmlParse:
             word in normalized
             for word in ("char", "short", "long", "signed", "int", "bool")
         ):
-            width_map = {
-                8: "int8_t",
-                16: "int16_t",
-                32: "int32_t",
-                64: "int64_t",
-                128: "int128_t",
-            }
-            base = width_map.get(size_in_bits)
+            base = _INTEGRAL_WIDTHS.get(size_in_bits)
             if base:
                 return TypeBase(name=f"u{base}" if is_unsigned else base)
 
@@ -116,10 +151,44 @@ class CastXmlParse:
                 )
             self._remove_unknown()
 
-    def _build_id_map(self):
-        self._id_map = {
-            elem.get("id"): elem for elem in self.xml_root.findall(".//*[@id]")
-        }
+    def _index_elements(self):
+        """
+        Single walk over the document: fills the id -> element map and returns,
+        in document order, the elements that _parse turns into definitions.
+        CastXML output is flat (every element with an id is a child of the root),
+        so nested <Argument>/<EnumValue> elements are not visited.
+        """
+        self._id_map = {}
+        self._type_cache = {}
+        candidates = []
+        for elem in self.xml_root:
+            elem_id = elem.get("id")
+            if elem_id is not None:
+                self._id_map[elem_id] = elem
+            if elem.tag in _DEFINITION_TAGS:
+                candidates.append(elem)
+        return candidates
+
+    def _prune_by_source(self, candidates):
+        """Drops candidates whose `file:line` location matches exclude_sources."""
+        patterns = self.exclude_sources
+        if isinstance(patterns, (str, re.Pattern)):
+            patterns = [patterns]
+        excluded = _any_search(patterns)
+        file_names = {}
+        kept = []
+        for elem in candidates:
+            file_id = elem.get("file")
+            if file_id not in file_names:
+                file_elem = self._id_map.get(file_id)
+                file_names[file_id] = (
+                    file_elem.get("name") if file_elem is not None else None
+                )
+            file_path = file_names[file_id]
+            if file_path and excluded(f"{file_path}:{elem.get('line')}"):
+                continue
+            kept.append(elem)
+        return kept
 
     def _parse(self):
         """
@@ -130,31 +199,34 @@ class CastXmlParse:
             raise RuntimeError("XML root is not loaded.")
 
         # cache by id
-        self._build_id_map()
+        candidates = self._index_elements()
+        if self.exclude_sources:
+            candidates = self._prune_by_source(candidates)
 
         self.data = []
-        for elem in self.xml_root.findall(".//"):
+        for elem in candidates:
             new_def = []
-            if elem.tag in ("Struct", "Class"):
+            tag = elem.tag
+            if tag in ("Struct", "Class"):
                 new_def = self._parse_with_wrapper(
                     elem, self._parse_struct, kind="struct"
                 )
-            elif elem.tag in ("Typedef") and elem.get("name"):
+            elif tag == "Typedef" and elem.get("name"):
                 new_def = self._parse_with_wrapper(
                     elem, self._parse_typedef, kind="typedef"
                 )
-            elif elem.tag in ("Enumeration"):
+            elif tag == "Enumeration":
                 new_def = self._parse_with_wrapper(elem, self._parse_enum, kind="enum")
-            elif elem.tag in ("Union"):
+            elif tag == "Union":
                 new_def = self._parse_with_wrapper(
                     elem, self._parse_union, kind="union"
                 )
-            elif elem.tag in ("Variable") and elem.get("init"):
+            elif tag == "Variable" and elem.get("init"):
                 new_def = self._parse_with_wrapper(
                     elem, self._parse_constant, kind="constant"
                 )
 
-            self.data = self.data + new_def
+            self.data.extend(new_def)
 
         if self.remove_unknown:
             self._remove_unknown()
@@ -210,12 +282,19 @@ class CastXmlParse:
         raise NotImplementedError(f"Type resolution not implemented for tag: {tag}")
 
     def _get_type(self, type_id):
-        type_name, size, align, elements = self._get_raw_type(type_id)
-        base_type = CastXmlParse._normalize_integral_type(
-            type_name, size, self.use_bool
-        )
-
-        return base_type, size, align, tuple(elements)
+        """
+        Resolved (type, size, align, elements) of a type id. Memoized per document,
+        so fields of the same type share one TypeBase and the chain is walked once.
+        """
+        resolved = self._type_cache.get(type_id)
+        if resolved is None:
+            type_name, size, align, elements = self._get_raw_type(type_id)
+            base_type = CastXmlParse._normalize_integral_type(
+                type_name, size, self.use_bool
+            )
+            resolved = (base_type, size, align, tuple(elements))
+            self._type_cache[type_id] = resolved
+        return resolved
 
     def _get_source_info(self, elem):
         """
@@ -1,13 +1,46 @@
 from __future__ import annotations
+import functools
+import os
 from pathlib import Path
 from .cast_xml_parse import CastXmlParse
 
+# Number of parsed documents parse() keeps; HIDA_PARSE_CACHE_SIZE=0 disables it
+_PARSE_CACHE_SIZE = int(os.environ.get("HIDA_PARSE_CACHE_SIZE", "8"))
+
+
+def _parse_uncached(xml_path: str, options: tuple):
+    parser = CastXmlParse(**dict(options))
+    return tuple(parser.parse_xml(Path(xml_path)))
+
+
+@functools.lru_cache(maxsize=_PARSE_CACHE_SIZE)
+def _parse_cached(xml_path: str, mtime_ns: int, size: int, options: tuple):
+    """Parse keyed on the file's identity; the stat fields make edits invalidate it."""
+    return _parse_uncached(xml_path, options)
+
 
 def parse(xml_path: str, **kwargs):
     """
     Helper function to parse a CastXML XML file with optional configuration parameters.
+
+    The last few results (HIDA_PARSE_CACHE_SIZE, default 8) are memoized per
+    (file, mtime, size, options); definitions are frozen, so each call returns a
+    new list sharing them. Calls with `verbose=True` or with unhashable option
+    values (e.g. a set of `exclude_sources`) always parse, so warnings are printed
+    every time.
     """
-    parser = CastXmlParse(**kwargs)
-    defs = parser.parse_xml(Path(xml_path))
+    xml_path = os.path.abspath(xml_path)
+    options = tuple(
+        sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in kwargs.items())
+    )
+    try:
+        hash(options)
+    except TypeError:
+        return list(_parse_uncached(xml_path, options))
+    if kwargs.get("verbose"):
+        return list(_parse_uncached(xml_path, options))
+
+    st = os.stat(xml_path)
+    defs = _parse_cached(xml_path, st.st_mtime_ns, st.st_size, options)
 
-    return defs
+    return list(defs)
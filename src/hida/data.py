@@ -1,9 +1,15 @@
-from dataclasses import dataclass, field
+import sys as _sys
+from dataclasses import dataclass, field, fields as _dc_fields
 from typing import Tuple, Optional, Union
 from enum import Enum, auto
 
+# slots (3.10+) drop the per-instance __dict__: smaller objects, faster attribute reads
+_FROZEN = (
+    dict(frozen=True, slots=True) if _sys.version_info >= (3, 10) else dict(frozen=True)
+)
 
-@dataclass(frozen=True)
+
+@dataclass(**_FROZEN)
 class TypeBase:
     name: str  # Name of the symbol (type, enum, typedef, etc.)
     namespace: Tuple[str] = field(
@@ -19,12 +25,12 @@ class TypeBase:
         )
 
 
-@dataclass(frozen=True)
+@dataclass(**_FROZEN)
 class DefinitionBase(TypeBase):
     source: str = ""  # Source ID from the CastXML document
 
 
-@dataclass(frozen=True)
+@dataclass(**_FROZEN)
 class Field:
     name: str  # Name of the field
     type: TypeBase  # C/C++ type of the field
@@ -32,35 +38,54 @@ class Field:
     bitoffset: int  # Bit offset from the start of the struct/union
     size_in_bits: int = 0  # Size of the field in bits
     bitfield: bool = False  # True if the field is a bitfield
+    padding: bool = False  # True if inserted by a fill_*_with_padding manipulator
+
+    def _with_type(
+        self, type: TypeBase, elements: Optional[Tuple[int]] = None
+    ) -> "Field":
+        """
+        Copy of this field with a new `type` (and optionally `elements`).
+        Same result as `dataclasses.replace`, without its per-call reflection.
+        """
+        new = object.__new__(Field)
+        for name in _FIELD_NAMES:
+            object.__setattr__(new, name, getattr(self, name))
+        object.__setattr__(new, "type", type)
+        if elements is not None:
+            object.__setattr__(new, "elements", elements)
+        return new
+
+
+_FIELD_NAMES = tuple(f.name for f in _dc_fields(Field))
 
 
-@dataclass(frozen=True)
+@dataclass(**_FROZEN)
 class ClassDefinition(DefinitionBase):
     alignment: int = 0  # Alignment requirement in bytes
     fields: Tuple[Field] = field(default_factory=tuple)  # Fields in the struct/class
     size: int = 0  # Total size in bytes
 
 
-@dataclass(frozen=True)
+@dataclass(**_FROZEN)
 class EnumName:
     name: str  # Name of the enumerator
     value: int  # Value assigned to the enumerator
 
 
-@dataclass(frozen=True)
+@dataclass(**_FROZEN)
 class EnumDefinition(DefinitionBase):
     size: int = 0  # Size of the enum type in bytes
     enums: Tuple[EnumName] = field(default_factory=tuple)  # Enumerators in the enum
 
 
-@dataclass(frozen=True)
+@dataclass(**_FROZEN)
 class UnionDefinition(DefinitionBase):
     alignment: int = 0  # Alignment requirement in bytes
     fields: Tuple[Field] = field(default_factory=tuple)  # Fields in the union
     size: int = 0  # Total size in bytes
 
 
-@dataclass(frozen=True)
+@dataclass(**_FROZEN)
 class TypedefDefinition(DefinitionBase):
     type: TypeBase = field(
         default_factory=TypeBase
@@ -70,7 +95,7 @@ class TypedefDefinition(DefinitionBase):
     )  # Array dimensions (empty if scalar)
 
 
-@dataclass(frozen=True)
+@dataclass(**_FROZEN)
 class ConstantDefinition(DefinitionBase):
     type: TypeBase = field(default_factory=TypeBase)  # C/C++ type of the constant
     value: Union[int, float, str] = ""  # Value of the constant
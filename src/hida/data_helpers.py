@@ -1,4 +1,4 @@
-from typing import List, Optional, Union
+from typing import Dict, List, Optional, Union
 from .data import *
 
 builtin_types = {
@@ -20,6 +20,28 @@ builtin_types = {
 }
 
 
+def index_by_name(data_structs, fallback_to_name=True) -> Dict[str, DefinitionBase]:
+    """
+    Builds a name -> definition dict whose `.get(name)` answers exactly like
+    find_type_by_name with the same fallback_to_name, for callers doing many
+    lookups over the same definitions.
+
+    Full names map to their first match; with fallback_to_name, base names
+    that are not also a full name map to the first item with that name.
+    """
+    index = {}
+    for item in data_structs:
+        if hasattr(item, "name"):
+            index.setdefault(getattr(item, "fullname", item.name), item)
+
+    if fallback_to_name:
+        for item in data_structs:
+            if hasattr(item, "name"):
+                index.setdefault(item.name, item)
+
+    return index
+
+
 def find_type_by_name(data_structs, name, fallback_to_name=True):
     """
     Finds and returns the first ClassDefinition, UnionDefinition, EnumDefinition,
@@ -2,13 +2,22 @@
 from __future__ import annotations
 
 from typing import get_origin, Tuple
+import functools
 import json, inspect
+import math
+import re
 from dataclasses import is_dataclass, fields
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Sequence, Type
 from hida import data as _data_mod  # your dataclasses live here
 
+try:  # optional C codec (the `fast` extra); the stdlib json is the fallback
+    import orjson
+except ImportError:
+    orjson = None
 
+
+@functools.lru_cache(maxsize=None)
 def _registry() -> Dict[str, Type]:
     reg: Dict[str, Type] = {}
     for name, obj in vars(_data_mod).items():
@@ -30,6 +39,32 @@ def _enc(x: Any) -> Any:
     return x
 
 
+@functools.lru_cache(maxsize=None)
+def _field_names(cls: Type) -> Tuple[str, ...]:
+    return tuple(f.name for f in fields(cls))
+
+
+def _orjson_default(x: Any) -> Any:
+    """
+    orjson hook: one level of a dataclass; orjson walks the values itself.
+    orjson writes inf/nan as null, so those are refused here and dumps() falls
+    back to the stdlib (as it does for integers beyond 64 bits).
+    """
+    if is_dataclass(x) and not isinstance(x, type):
+        d = {"__kind__": type(x).__name__}
+        for name in _field_names(type(x)):
+            value = getattr(x, name)
+            if isinstance(value, float) and not math.isfinite(value):
+                raise TypeError(f"Non-finite float in {type(x).__name__}.{name}")
+            d[name] = value
+        return d
+    raise TypeError(f"Cannot serialize {type(x).__name__}")
+
+
+# orjson decodes integers beyond 64 bits as floats; 19+ digit runs go to the stdlib
+_LONG_DIGITS = re.compile(r"\d{19}")
+
+
 def _dec(x, reg):
     if isinstance(x, dict) and "__kind__" in x:
         d = dict(x)
@@ -53,6 +88,20 @@ def _dec(x, reg):
 
 
 def dumps(defs: Sequence[Any], *, indent: Optional[int] = 2) -> str:
+    # orjson's compact form uses ","/":" separators where the stdlib writes ", "/": ",
+    # so only the default indent=2 (byte-identical in both) goes through orjson
+    if orjson is not None and indent == 2:
+        option = (
+            orjson.OPT_PASSTHROUGH_DATACLASS
+            | orjson.OPT_NON_STR_KEYS
+            | orjson.OPT_INDENT_2
+        )
+        try:
+            return orjson.dumps(
+                list(defs), default=_orjson_default, option=option
+            ).decode()
+        except orjson.JSONEncodeError:
+            pass  # inf/nan or a >64-bit integer: the stdlib handles both
     return json.dumps([_enc(d) for d in defs], indent=indent, ensure_ascii=False)
 
 
@@ -62,7 +111,14 @@ def dump(defs: Sequence[Any], path: str | Path, *, indent: Optional[int] = 2) ->
 
 def loads(text: str) -> List[Any]:
     reg = _registry()
-    data = json.loads(text)
+    data = None
+    if orjson is not None and not _LONG_DIGITS.search(text):
+        try:
+            data = orjson.loads(text)
+        except orjson.JSONDecodeError:
+            pass  # e.g. Infinity/NaN written by the stdlib encoder
+    if data is None:
+        data = json.loads(text)
     if not isinstance(data, list):
         raise TypeError("Expected a JSON array")
     return [_dec(item, reg) for item in data]
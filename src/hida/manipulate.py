@@ -1,65 +1,167 @@
+import functools
+import operator
 import re
-from typing import List, Optional, Union, Dict, Set, Iterable, Tuple, Sequence
+from typing import (
+    Callable, List, Optional, Union, Dict, Set, Iterable, Tuple, Sequence
+)
 from pathlib import PurePath
 from collections import defaultdict
 from dataclasses import replace
+from itertools import product
 
 
 from .data import *
 
 
+def _intern(types: Dict[TypeBase, TypeBase], t: TypeBase) -> TypeBase:
+    """
+    Return the instance in `types` equal to `t` (TypeBase is frozen, hence hashable).
+    Each manipulator call owns its table: many fields refer to the same handful of
+    types (`int`, `uint32_t`, ...), so rebuilt types share one instance per call
+    instead of piling up copies, and nothing outlives the call.
+    """
+    return types.setdefault(t, t)
+
+
+_BITOFF = operator.attrgetter("bitoffset")
+
+
+def _total_bits(f: Field) -> int:
+    """Bits a field occupies, counting every element of an array."""
+    count = 1
+    for dim in f.elements or ():
+        count *= dim
+    return f.size_in_bits * max(1, count)
+
+
+def _by_bitoffset(fields: Sequence[Field]) -> Sequence[Field]:
+    """
+    Return `fields` in ascending bit offset order. CastXML already emits members
+    in layout order, so the (stable) sort is skipped when nothing is out of place.
+    """
+    if all(a.bitoffset <= b.bitoffset for a, b in zip(fields, fields[1:])):
+        return fields
+    return sorted(fields, key=_BITOFF)
+
+
+# Compiler, SDK and system header locations; see get_system_include_regexes()
+_SYSTEM_INCLUDE_REGEXES: Tuple[str, ...] = (
+    r"builtin",
+    r".*\\Program Files\\.*",  # VS STL, Windows SDK
+    r".*\\Microsoft Visual Studio\\.*",
+    r".*\\Windows Kits\\.*",
+    r".*\\vcpkg\\installed\\.*?\\include\\.*",
+    r".*/Program Files/.*",  # VS STL, Windows SDK
+    r".*/Microsoft Visual Studio/.*",
+    r".*/Windows Kits/.*",
+    r".*/vcpkg/installed/.*?/include/.*",  # linux
+    r"^<builtin>",
+    r"^/usr/include/",
+    r"^/usr/local/include/",
+    r"^/usr/lib/clang/.*/include/",
+    r"/clang/include/",
+    r"/x86_64-linux-gnu/",
+    r"^/opt/",
+)
+
+
 def get_system_include_regexes() -> List[str]:
     """
     Returns a list of regex patterns that match system include directories.
     Includes common Windows and Unix/GCC/Clang paths.
     """
-    return [
-        r"builtin",
-        r".*\\Program Files\\.*",  # VS STL, Windows SDK
-        r".*\\Microsoft Visual Studio\\.*",
-        r".*\\Windows Kits\\.*",
-        r".*\\vcpkg\\installed\\.*?\\include\\.*",
-        r".*/Program Files/.*",  # VS STL, Windows SDK
-        r".*/Microsoft Visual Studio/.*",
-        r".*/Windows Kits/.*",
-        r".*/vcpkg/installed/.*?/include/.*",  # linux
-        r"^<builtin>",
-        r"^/usr/include/",
-        r"^/usr/local/include/",
-        r"^/usr/lib/clang/.*/include/",
-        r"/clang/include/",
-        r"/x86_64-linux-gnu/",
-        r"^/opt/",
+    return list(_SYSTEM_INCLUDE_REGEXES)
+
+
+_REGEX_META = re.compile(r"[.^$*+?{}\[\]\\|()]")
+_DEFAULT_FLAGS = re.compile("").flags
+
+_PatternLike = Union[str, re.Pattern]
+
+# Upper bound on patterns fused into one alternation; longer lists are split
+# into several alternations to keep each compiled program small.
+_MAX_FUSED = 64
+
+# re's own cache is shared with every other module; keep the filter's patterns
+# (including the fused alternations) compiled here across calls.
+_compile = functools.lru_cache(maxsize=256)(re.compile)
+
+
+def _literal_prefix(pattern: str) -> Optional[str]:
+    """Return the text of a pure `^literal` pattern, or None if it is anything else."""
+    if pattern.startswith("^") and not _REGEX_META.search(pattern, 1):
+        return pattern[1:]
+    return None
+
+
+def _any_search(patterns: Iterable[_PatternLike]) -> Callable[[str], bool]:
+    """
+    Build a predicate equivalent to `any(re.search(p, s) for p in patterns)`.
+
+    Pure `^literal` prefixes are checked with one `str.startswith` call, and the
+    remaining patterns are fused into a single alternation so each string is
+    scanned once. Patterns with groups or global inline flags would change
+    meaning inside an alternation, so those are searched on their own.
+    Precompiled patterns are used as they are. Predicates are memoized per
+    pattern tuple, so repeated filters with the same list are built once.
+    """
+    return _any_search_cached(tuple(patterns))
+
+
+@functools.lru_cache(maxsize=64)
+def _any_search_cached(patterns: Tuple[_PatternLike, ...]) -> Callable[[str], bool]:
+    prefixes: List[str] = []
+    fusable: List[str] = []
+    singles: List[re.Pattern] = []
+    for p in patterns:
+        compiled = p if isinstance(p, re.Pattern) else _compile(p)
+        if compiled.groups or compiled.flags != _DEFAULT_FLAGS:
+            singles.append(compiled)
+            continue
+        prefix = _literal_prefix(compiled.pattern)
+        if prefix is not None:
+            prefixes.append(prefix)
+        else:
+            fusable.append(compiled.pattern)
+    singles[:0] = [
+        _compile("|".join(f"(?:{p})" for p in fusable[i : i + _MAX_FUSED]))
+        for i in range(0, len(fusable), _MAX_FUSED)
     ]
 
+    prefix_tuple = tuple(prefixes)
+    searches = [p.search for p in singles]
+
+    def matches(s: str) -> bool:
+        return s.startswith(prefix_tuple) or any(search(s) for search in searches)
+
+    return matches
+
 
 def filter_by_source_regexes(
     definitions: List[DefinitionBase],
-    include: Optional[Union[str, List[str]]] = None,
-    exclude: Optional[Union[str, List[str]]] = None,
+    include: Optional[Union[_PatternLike, List[_PatternLike]]] = None,
+    exclude: Optional[Union[_PatternLike, List[_PatternLike]]] = None,
 ) -> List[DefinitionBase]:
     """
     Filters definitions based on regexes matching their `source` field.
 
     - `include`: pattern or list of patterns. If provided, only matching sources are kept.
     - `exclude`: pattern or list of patterns. If provided, matching sources are removed.
+
+    Patterns may be strings or compiled `re.Pattern` objects.
     """
-    if isinstance(include, str):
+    if isinstance(include, (str, re.Pattern)):
         include = [include]
-    if isinstance(exclude, str):
+    if isinstance(exclude, (str, re.Pattern)):
         exclude = [exclude]
 
-    include_patterns = [re.compile(p) for p in include] if include else []
-    exclude_patterns = [re.compile(p) for p in exclude] if exclude else []
-
-    def should_keep(defn: DefinitionBase) -> bool:
-        if include_patterns:
-            return any(p.search(defn.source) for p in include_patterns)
-        if exclude_patterns:
-            return not any(p.search(defn.source) for p in exclude_patterns)
-        return True
-
-    return [d for d in definitions if should_keep(d)]
+    if include:
+        included = _any_search(include)
+        return [d for d in definitions if included(d.source)]
+    if exclude:
+        excluded = _any_search(exclude)
+        return [d for d in definitions if not excluded(d.source)]
+    return list(definitions)
 
 
 def filter_by_name_regexes(
@@ -113,7 +215,9 @@ from typing import List, Tuple
 
 # --- Helper ---------------------------------------------------------------
 
-def _emit_pad_fields(pad_bits: int, *, bitoffset: int, name_prefix: str) -> List[Field]:
+def _emit_pad_fields(
+    pad_bits: int, *, bitoffset: int, name_prefix: str, types: Dict[TypeBase, TypeBase]
+) -> List[Field]:
     """
     Emit padding as:
       - [optional] array of `uint8_t` for full bytes
@@ -125,7 +229,7 @@ def _emit_pad_fields(pad_bits: int, *, bitoffset: int, name_prefix: str) -> List
     fields: List[Field] = []
     bytes_count, rem_bits = divmod(pad_bits, 8)
 
-    u8 = TypeBase(name="uint8_t", namespace=())
+    u8 = _intern(types, TypeBase(name="uint8_t", namespace=()))
 
     if bytes_count > 0:
         fields.append(
@@ -136,6 +240,7 @@ def _emit_pad_fields(pad_bits: int, *, bitoffset: int, name_prefix: str) -> List
                 bitoffset=bitoffset,
                 size_in_bits=8 * bytes_count,  # total size of array
                 bitfield=False,
+                padding=True,
             )
         )
         bitoffset += 8 * bytes_count
@@ -149,6 +254,7 @@ def _emit_pad_fields(pad_bits: int, *, bitoffset: int, name_prefix: str) -> List
                 bitoffset=bitoffset,
                 size_in_bits=rem_bits,         # width of the bitfield
                 bitfield=True,
+                padding=True,
             )
         )
 
@@ -218,6 +324,7 @@ def _emit_same_type_bitfield_pad_slices(
                 bitoffset=bitoffset + emitted,
                 size_in_bits=width,           # this bitfield's width
                 bitfield=True,
+                padding=True,
             )
         )
         emitted += width
@@ -252,7 +359,8 @@ def fill_bitfield_holes_with_padding(definitions):
         last_orig_bitfield_type: Optional[TypeBase] = None
 
         # Process fields in ascending bit offset
-        for f in sorted(d.fields, key=lambda x: x.bitoffset):
+        ordered = _by_bitoffset(d.fields)
+        for f in ordered:
             # If there is a hole before f, pad only if f is a bitfield,
             # and use f.type as the padding type
             if f.bitoffset > prev_end and getattr(f, "bitfield", False):
@@ -275,11 +383,7 @@ def fill_bitfield_holes_with_padding(definitions):
                 last_orig_bitfield_type = f.type
 
             # Advance prev_end by total size (handle arrays if ever present)
-            count = 1
-            for dim in getattr(f, "elements", ()) or ():
-                count *= dim
-            field_total_bits = f.size_in_bits * max(1, count)
-            prev_end = max(prev_end, f.bitoffset + field_total_bits)
+            prev_end = max(prev_end, f.bitoffset + _total_bits(f))
 
         # Trailing hole up to struct size: pad only if the last original field was a bitfield,
         # using its exact type
@@ -296,7 +400,10 @@ def fill_bitfield_holes_with_padding(definitions):
                 new_fields.extend(pads)
                 pad_counter += 1
 
-        updated.append(replace(d, fields=tuple(new_fields)))
+        if ordered is d.fields and len(new_fields) == len(d.fields):
+            updated.append(d)  # sorted, no holes: keep the (frozen) definition as is
+        else:
+            updated.append(replace(d, fields=tuple(new_fields)))
 
     return updated
 
@@ -315,6 +422,7 @@ def fill_struct_holes_with_padding_bytes(definitions):
     """
     result = []
     pad_counter = 0
+    types: Dict[TypeBase, TypeBase] = {}
 
     for d in definitions:
         if not isinstance(d, (ClassDefinition, UnionDefinition)) or not d.fields:
@@ -324,7 +432,8 @@ def fill_struct_holes_with_padding_bytes(definitions):
         new_fields: List[Field] = []
         prev_end = 0  # in bits
 
-        for f in sorted(d.fields, key=lambda x: x.bitoffset):
+        ordered = _by_bitoffset(d.fields)
+        for f in ordered:
             start = f.bitoffset
 
             # Hole before field?
@@ -335,6 +444,7 @@ def fill_struct_holes_with_padding_bytes(definitions):
                         hole,
                         bitoffset=prev_end,
                         name_prefix=f"__pad{pad_counter}",
+                        types=types,
                     )
                 )
                 pad_counter += 1
@@ -342,11 +452,7 @@ def fill_struct_holes_with_padding_bytes(definitions):
             new_fields.append(f)
 
             # Advance prev_end by total size (handle arrays)
-            count = 1
-            for dim in getattr(f, "elements", ()) or ():
-                count *= dim
-            field_total_bits = f.size_in_bits * max(1, count)
-            prev_end = max(prev_end, start + field_total_bits)
+            prev_end = max(prev_end, start + _total_bits(f))
 
         # Trailing hole up to declared size
         struct_end = d.size * 8
@@ -357,23 +463,116 @@ def fill_struct_holes_with_padding_bytes(definitions):
                     tail,
                     bitoffset=prev_end,
                     name_prefix=f"__pad{pad_counter}",
+                    types=types,
                 )
             )
             pad_counter += 1
 
-        result.append(replace(d, fields=tuple(new_fields)))
+        if ordered is d.fields and len(new_fields) == len(d.fields):
+            result.append(d)  # sorted, no holes: keep the (frozen) definition as is
+        else:
+            result.append(replace(d, fields=tuple(new_fields)))
 
     return result
 
 
+def _natural_align(f: Field, defs_by_fullname: Dict[str, TypeBase]) -> Optional[int]:
+    """
+    Alignment of a field in bytes: the declared alignment of a struct/union member,
+    the size of an enum or scalar element. None when it cannot be derived (typedefs).
+    """
+    d = defs_by_fullname.get(f.type.fullname)
+    if isinstance(d, (ClassDefinition, UnionDefinition)):
+        return d.alignment or None
+    if isinstance(d, EnumDefinition):
+        return d.size or None
+    if d is not None:
+        return None
+    return f.size_in_bits // 8 or None
+
+
+def reorder_fields_min_padding(definitions: List[TypeBase]) -> List[TypeBase]:
+    """
+    Returns definitions where each struct's fields are reordered to minimize padding
+    (the greedy layout of LLVM's performOptimizedStructLayout without fixed fields):
+    fields are placed by descending alignment, then descending size, and bit offsets
+    and the struct size are recomputed.
+
+    Unions, structs with bitfields, packed structs (a member more aligned than the
+    struct), structs whose member alignment cannot be derived and structs that
+    already carry fill_*_with_padding fields (whose `size_in_bits` covers the whole
+    pad array, not one element) are left unchanged, as is any struct that would not
+    get smaller. Structs embedded in another struct/union or named by a typedef are
+    kept too: shrinking them would leave the sizes and offsets of their users stale.
+    """
+    defs_by_fullname: Dict[str, TypeBase] = {d.fullname: d for d in definitions}
+    embedded: Set[str] = set()
+    for d in definitions:
+        if isinstance(d, (ClassDefinition, UnionDefinition)):
+            embedded.update(f.type.fullname for f in d.fields)
+        elif isinstance(d, TypedefDefinition):
+            embedded.add(d.type.fullname)
+    result = []
+
+    for d in definitions:
+        if (
+            not isinstance(d, ClassDefinition)
+            or d.fullname in embedded
+            or not d.fields
+            or not d.alignment
+            or any(f.bitfield or f.padding for f in d.fields)
+        ):
+            result.append(d)
+            continue
+
+        aligns = [_natural_align(f, defs_by_fullname) for f in d.fields]
+        if None in aligns or max(aligns) > d.alignment:
+            result.append(d)
+            continue
+
+        order = sorted(
+            range(len(d.fields)),
+            key=lambda i: (-aligns[i], -_total_bits(d.fields[i])),
+        )
+        new_fields: List[Field] = []
+        offset = 0  # in bits
+        for i in order:
+            align_bits = aligns[i] * 8
+            offset = -(-offset // align_bits) * align_bits
+            new_fields.append(replace(d.fields[i], bitoffset=offset))
+            offset += _total_bits(d.fields[i])
+
+        struct_align = d.alignment * 8
+        size = -(-offset // struct_align) * struct_align // 8
+        if size >= d.size:
+            result.append(d)
+        else:
+            result.append(replace(d, fields=tuple(new_fields), size=size))
+
+    return result
+
 
 def _flattened_name(ns: Sequence[str], name: str, sep: str = "__") -> str:
     parts = list(ns or ())
     return (sep.join(parts) + sep + name) if parts else name
 
-def _flatten_type(t: TypeBase, sep: str) -> TypeBase:
+def _flatten_type(t: TypeBase, sep: str, types: Dict[TypeBase, TypeBase]) -> TypeBase:
     """Return a copy of t with namespace folded into name and namespace cleared."""
-    return replace(t, name=_flattened_name(t.namespace, t.name, sep), namespace=())
+    return _intern(
+        types, replace(t, name=_flattened_name(t.namespace, t.name, sep), namespace=())
+    )
+
+
+def _uses_namespaces(d: TypeBase) -> bool:
+    """True if `d` or any type it embeds (fields / typedef / constant) is namespaced."""
+    if d.namespace:
+        return True
+    if isinstance(d, (ClassDefinition, UnionDefinition)):
+        return any(f.type.namespace for f in d.fields)
+    if isinstance(d, (TypedefDefinition, ConstantDefinition)):
+        return bool(d.type.namespace)
+    return False
+
 
 def flatten_namespaces(definitions: List[TypeBase], sep: str = "__") -> List[TypeBase]:
     """
@@ -383,25 +582,33 @@ def flatten_namespaces(definitions: List[TypeBase], sep: str = "__") -> List[Typ
     Also rewrites any *embedded type references* (fields / typedef / constant)
     by producing flattened copies of those types on the fly.
     No global mapping is used.
+
+    Definitions with nothing namespaced (e.g. plain C headers) are passed through
+    as-is rather than copied.
     """
     out: List[TypeBase] = []
+    types: Dict[TypeBase, TypeBase] = {}
 
     for d in definitions:
+        if not _uses_namespaces(d):
+            out.append(d)
+            continue
+
         # Start with a flattened copy of the definition itself
         nd = replace(d, name=_flattened_name(d.namespace, d.name, sep), namespace=())
 
         # Fix embedded references per kind
         if isinstance(nd, (ClassDefinition, UnionDefinition)) and d.fields:
             new_fields = tuple(
-                replace(f, type=_flatten_type(f.type, sep)) for f in d.fields
+                f._with_type(_flatten_type(f.type, sep, types)) for f in d.fields
             )
             nd = replace(nd, fields=new_fields)
 
         elif isinstance(nd, TypedefDefinition):
-            nd = replace(nd, type=_flatten_type(d.type, sep))
+            nd = replace(nd, type=_flatten_type(d.type, sep, types))
 
         elif isinstance(nd, ConstantDefinition):
-            nd = replace(nd, type=_flatten_type(d.type, sep))
+            nd = replace(nd, type=_flatten_type(d.type, sep, types))
 
         # EnumDefinition has no embedded type references to adjust
 
@@ -423,22 +630,39 @@ def resolve_typedefs(definitions):
         td.name: td for td in definitions if isinstance(td, TypedefDefinition)
     }
 
+    # typedef name -> (underlying type, typedef array dims), filled on demand
+    resolved: Dict[str, Tuple[TypeBase, Tuple[int, ...]]] = {}
+    visiting: Set[str] = set()
+
+    def resolve_typedef(name: str) -> Tuple[TypeBase, Tuple[int, ...]]:
+        if name in resolved:
+            return resolved[name]
+        if name in visiting:
+            raise ValueError(f"Recursive typedef detected: {name}")
+        visiting.add(name)
+        td = typedef_map[name]
+        if td.type.name in typedef_map:
+            typ, inner = resolve_typedef(td.type.name)
+            result = (typ, inner + td.elements)  # deeper typedef dims come first
+        else:
+            result = (td.type, td.elements)
+        visiting.discard(name)
+        resolved[name] = result
+        return result
+
     def resolve_type(
         typ: TypeBase, elements: Tuple[int] = ()
     ) -> Tuple[TypeBase, Tuple[int]]:
-        seen = set()
-        while typ.name in typedef_map:
-            if typ.name in seen:
-                raise ValueError(f"Recursive typedef detected: {typ.name}")
-            seen.add(typ.name)
-            td = typedef_map[typ.name]
-            typ = td.type
-            elements = td.elements + elements  # prepend typedef array dims
-        return typ, elements
+        if typ.name not in typedef_map:
+            return typ, elements
+        new_type, td_elements = resolve_typedef(typ.name)
+        return new_type, td_elements + elements  # prepend typedef array dims
 
     def update_field(field: Field) -> Field:
         new_type, new_elements = resolve_type(field.type, field.elements)
-        return replace(field, type=new_type, elements=new_elements)
+        if new_type is field.type and new_elements == field.elements:
+            return field
+        return field._with_type(new_type, new_elements)
 
     updated = []
     for d in definitions:
@@ -479,11 +703,19 @@ def build_type_dependency_graph(definitions: List[TypeBase]) -> Dict[str, Set[st
     return graph
 
 
-def sort_definitions_topologically(definitions: List[TypeBase]) -> List[TypeBase]:
+def sort_definitions_topologically(
+    definitions: List[TypeBase],
+    *,
+    graph: Optional[Dict[str, Set[str]]] = None,
+) -> List[TypeBase]:
     """
     Reorders the definitions so all dependencies are defined before use.
+
+    `graph` may be a result of `build_type_dependency_graph(definitions)` that the
+    caller already has (e.g. shared with `filter_connected_definitions`).
     """
-    graph = build_type_dependency_graph(definitions)
+    if graph is None:
+        graph = build_type_dependency_graph(definitions)
     name_to_def = {d.fullname: d for d in definitions}
     visited = {}
     result = []
@@ -509,16 +741,23 @@ def sort_definitions_topologically(definitions: List[TypeBase]) -> List[TypeBase
 
 
 def filter_connected_definitions(
-    definitions: List[TypeBase], roots: Union[str, List[str]]
+    definitions: List[TypeBase],
+    roots: Union[str, List[str]],
+    *,
+    graph: Optional[Dict[str, Set[str]]] = None,
 ) -> List[TypeBase]:
     """
     Filters the definitions list to include only those reachable from the given root type(s),
     based on field, typedef, or constant dependencies.
+
+    `graph` may be a prebuilt `build_type_dependency_graph(definitions)`, so a
+    filter-then-sort pipeline only builds it once.
     """
     if isinstance(roots, str):
         roots = [roots]
 
-    graph = build_type_dependency_graph(definitions)
+    if graph is None:
+        graph = build_type_dependency_graph(definitions)
     visited = set()
     stack = list(roots)
     if not any([graph.get(v, None) for v in stack]):
@@ -570,105 +809,86 @@ def flatten_structs(
         d = defs_by_fullname.get(fullname)
         return isinstance(d, (ClassDefinition, UnionDefinition))
 
-    def flatten_fields(parent_base_bits: int, prefix: str, f: Field) -> Iterable[Field]:
+    def subfield_items(ref: TypeBase, name_prefix: str, base_off: int) -> List:
         """
-        Yield flattened fields for a single (possibly composite/array) field `f`, using
-        `parent_base_bits` as the bit base and `prefix` as the full name prefix that
-        must be preserved across recursion.
+        Work items for the subfields of composite `ref` placed at `base_off`: finished
+        `Field`s for leaves and kept arrays, `(base_bits, prefix, field)` for members
+        that still need expanding.
         """
-        ref = defs_by_fullname.get(f.type.fullname)
-        if not isinstance(ref, (ClassDefinition, UnionDefinition)):
-            # Leaf (non-composite): keep, but apply prefix and adjusted offsets.
-            new_name = prefix or f.name
-            yield replace(f, name=new_name, bitoffset=parent_base_bits + f.bitoffset)
-            return
-
-        # Helper to emit subfields of the composite `ref` for a specific element base
-        def emit_subfields(name_prefix: str, elem_bit_base: int):
-            base_name = name_prefix  # the accumulated name prefix
-            base_off = parent_base_bits + f.bitoffset + elem_bit_base
-            for sf in sorted(ref.fields, key=lambda x: x.bitoffset):
-                sf_ref = defs_by_fullname.get(sf.type.fullname)
-                sf_is_comp = isinstance(sf_ref, (ClassDefinition, UnionDefinition))
-
-                if sf_is_comp:
-                    if sf.elements:
-                        # Inner array of composites
-                        if not flatten_arrays:
-                            # Keep the array as-is
-                            yield replace(
-                                sf,
-                                name=f"{base_name}{separator}{sf.name}",
-                                bitoffset=base_off + sf.bitoffset,
-                            )
-                        else:
-                            # Unroll inner composite array
-                            from itertools import product
-
-                            dims: List[int] = list(sf.elements)
-                            elem_stride_bits2 = sf_ref.size * 8
-
-                            def linear_index(idxs: Tuple[int, ...], dims: List[int]) -> int:
-                                stride = 1
-                                idx = 0
-                                for i, d in zip(reversed(idxs), reversed(dims)):
-                                    idx += i * stride
-                                    stride *= d
-                                return idx
-
-                            for idxs in product(*[range(d) for d in dims]):
-                                lin = linear_index(idxs, dims)
-                                elem_base2 = lin * elem_stride_bits2
-                                idx_suffix = "".join(f"_{i}_" for i in idxs)
-                                # Recurse into the composite element
-                                yield from flatten_fields(
-                                    base_off + sf.bitoffset + elem_base2,
-                                    f"{base_name}{separator}{sf.name}{idx_suffix}",
-                                    replace(sf, elements=()),  # same type, but treat as single element
-                                )
-                    else:
-                        # Simple composite field: recurse
-                        yield from flatten_fields(
-                            base_off,
-                            f"{base_name}{separator}{sf.name}",
-                            sf,
-                        )
-                else:
-                    # Primitive (or typedef to primitive); keep (we do NOT unroll scalar arrays)
-                    yield replace(
-                        sf,
-                        name=f"{base_name}{separator}{sf.name}",
-                        bitoffset=base_off + sf.bitoffset,
+        items: List = []
+        for sf in _by_bitoffset(ref.fields):
+            sf_ref = defs_by_fullname.get(sf.type.fullname)
+            sf_name = f"{name_prefix}{separator}{sf.name}"
+
+            if not isinstance(sf_ref, (ClassDefinition, UnionDefinition)):
+                # Primitive (or typedef to primitive); keep (we do NOT unroll scalar arrays)
+                items.append(replace(sf, name=sf_name, bitoffset=base_off + sf.bitoffset))
+            elif not sf.elements:
+                # Simple composite field: expand later
+                items.append((base_off, sf_name, sf))
+            elif not flatten_arrays:
+                # Inner array of composites: keep the array as-is
+                items.append(replace(sf, name=sf_name, bitoffset=base_off + sf.bitoffset))
+            else:
+                # Unroll inner composite array, one element at a time
+                dims: List[int] = list(sf.elements)
+                elem_stride_bits = sf_ref.size * 8
+                single = replace(sf, elements=())  # same type, but treat as single element
+                # product() walks indices in row-major order, so the running count
+                # is the element's linear index
+                for lin, idxs in enumerate(product(*[range(d) for d in dims])):
+                    elem_base = lin * elem_stride_bits
+                    idx_suffix = "".join(f"_{i}_" for i in idxs)
+                    items.append(
+                        (base_off + sf.bitoffset + elem_base, f"{sf_name}{idx_suffix}", single)
                     )
+        return items
 
-        # Top-level handling for `f` (which is composite here)
-        base_name = prefix or f.name
-        if not f.elements:
-            # Single composite
-            yield from emit_subfields(base_name, 0)
-        else:
-            # Array of composites at this level
-            if not flatten_arrays:
-                yield replace(f, name=base_name, bitoffset=parent_base_bits + f.bitoffset)
-            else:
-                from itertools import product
+    def flatten_fields(parent_base_bits: int, prefix: str, f: Field) -> List[Field]:
+        """
+        Return flattened fields for a single (possibly composite/array) field `f`, using
+        `parent_base_bits` as the bit base and `prefix` as the full name prefix that
+        must be preserved through nesting.
 
-                dims: List[int] = list(f.elements)
+        Nested composites are walked with an explicit stack; children are pushed in
+        reverse so they are emitted in order.
+        """
+        out: List[Field] = []
+        stack: List = [(parent_base_bits, prefix, f)]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, Field):
+                out.append(item)
+                continue
+
+            base_bits, name_prefix, cur = item
+            ref = defs_by_fullname.get(cur.type.fullname)
+            base_name = name_prefix or cur.name
+            if not isinstance(ref, (ClassDefinition, UnionDefinition)) or (
+                cur.elements and not flatten_arrays
+            ):
+                # Leaf (non-composite), or a composite array kept intact:
+                # keep, but apply prefix and adjusted offsets.
+                out.append(replace(cur, name=base_name, bitoffset=base_bits + cur.bitoffset))
+                continue
+
+            base_off = base_bits + cur.bitoffset
+            if not cur.elements:
+                # Single composite
+                children = subfield_items(ref, base_name, base_off)
+            else:
+                # Array of composites at this level
+                dims: List[int] = list(cur.elements)
                 elem_stride_bits = ref.size * 8
-
-                def linear_index(idxs: Tuple[int, ...], dims: List[int]) -> int:
-                    stride = 1
-                    idx = 0
-                    for i, d in zip(reversed(idxs), reversed(dims)):
-                        idx += i * stride
-                        stride *= d
-                    return idx
-
-                for idxs in product(*[range(d) for d in dims]):
-                    lin = linear_index(idxs, dims)
+                children = []
+                for lin, idxs in enumerate(product(*[range(d) for d in dims])):
                     elem_base = lin * elem_stride_bits
                     idx_suffix = "".join(f"_{i}_" for i in idxs)
-                    yield from emit_subfields(f"{base_name}{idx_suffix}", elem_base)
+                    children.extend(
+                        subfield_items(ref, f"{base_name}{idx_suffix}", base_off + elem_base)
+                    )
+            stack.extend(reversed(children))
+        return out
 
     new_defs: List[TypeBase] = []
     no_change = True
@@ -683,14 +903,14 @@ def flatten_structs(
 
         no_change = False
         flat_fields: List[Field] = []
-        for f in sorted(d.fields, key=lambda x: x.bitoffset):
+        for f in _by_bitoffset(d.fields):
             ref = defs_by_fullname.get(f.type.fullname)
             if isinstance(ref, (ClassDefinition, UnionDefinition)):
-                flat_fields.extend(list(flatten_fields(0, "", f)))
+                flat_fields.extend(flatten_fields(0, "", f))
             else:
                 flat_fields.append(f)
 
-        flat_fields.sort(key=lambda x: x.bitoffset)
+        flat_fields.sort(key=_BITOFF)
         new_defs.append(replace(d, fields=tuple(flat_fields)))
 
     if no_change:
@@ -710,6 +930,7 @@ def remove_enums(
     """
     # Build enum -> replacement type map
     enum_map: Dict[str, TypeBase] = {}
+    types: Dict[TypeBase, TypeBase] = {}
     for d in definitions:
         if isinstance(d, EnumDefinition):
             # Try to discover an underlying type; adapt to your datamodel
@@ -717,9 +938,9 @@ def remove_enums(
             if isinstance(underlying, TypeBase):
                 enum_map[d.fullname] = underlying
             elif isinstance(underlying, str):
-                enum_map[d.fullname] = TypeBase(name=underlying)
+                enum_map[d.fullname] = _intern(types, TypeBase(name=underlying))
             else:
-                enum_map[d.fullname] = TypeBase(name=default_int_type)
+                enum_map[d.fullname] = _intern(types, TypeBase(name=default_int_type))
 
     def subst_type(t: TypeBase) -> TypeBase:
         # Replace if this type is an enum (match by fullname or by name as fallback)
@@ -752,7 +973,7 @@ def remove_enums(
             # drop enum definitions
             continue
         elif isinstance(d, (ClassDefinition, UnionDefinition)):
-            new_fields = tuple(replace(f, type=subst_type(f.type)) for f in d.fields)
+            new_fields = tuple(f._with_type(subst_type(f.type)) for f in d.fields)
             out.append(replace(d, fields=new_fields))
         elif isinstance(d, TypedefDefinition):
             out.append(replace(d, type=subst_type(d.type)))
@@ -763,6 +984,18 @@ def remove_enums(
     return out
 
 
+@functools.lru_cache(maxsize=4096)
+def _source_basename(source: str) -> str:
+    """Basename of a `source` string; memoized, as sources recur across calls."""
+    s_stripped = source.strip().strip('"').strip("'")
+    if s_stripped.startswith("<") and s_stripped.endswith(">"):
+        return s_stripped  # keep pseudo-sources like <built-in>
+    if s_stripped:
+        # PurePath is OS-agnostic; handles both "/" and "\".
+        return PurePath(s_stripped).name
+    return ""
+
+
 def remove_source(
     definitions: List[DefinitionBase], *, header_only: bool = False
 ) -> List[DefinitionBase]:
@@ -776,17 +1009,6 @@ def remove_source(
     """
     out = []
     for d in definitions:
-        s = d.source or ""
-        if not header_only:
-            new_s = ""
-        else:
-            s_stripped = s.strip().strip('"').strip("'")
-            if s_stripped.startswith("<") and s_stripped.endswith(">"):
-                new_s = s_stripped  # keep pseudo-sources like <built-in>
-            elif s_stripped:
-                # PurePath is OS-agnostic; handles both "/" and "\".
-                new_s = PurePath(s_stripped).name
-            else:
-                new_s = ""
+        new_s = _source_basename(d.source or "") if header_only else ""
         out.append(replace(d, source=new_s))
     return out
@@ -1,9 +1,51 @@
 # conftest.py
 from __future__ import annotations
 from dataclasses import dataclass
-import platform
+from pathlib import Path
+import functools
+import hashlib
+import os
+import pickle
+import subprocess
+import sys
+from types import MappingProxyType
 import pytest
 
+# repo root on sys.path once for the whole test session
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import hida
+from hida import index_by_name, parse
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--runslow", action="store_true", default=False, help="run slow tests"
+    )
+    parser.addoption(
+        "--no-parse-cache",
+        action="store_true",
+        default=False,
+        help="always re-parse fixture XML instead of loading pickles from earlier runs",
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "slow: slow test, only run with --runslow")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--runslow"):
+        return
+    skip_slow = pytest.mark.skip(reason="needs --runslow")
+    for item in items:
+        if "slow" in item.keywords:
+            item.add_marker(skip_slow)
+
+
+IS_WINDOWS = sys.platform == "win32"
+HEADERS_DIR = Path(__file__).resolve().parent.parent / "headers"
+
 
 @dataclass(frozen=True)
 class CxPlat:
@@ -11,18 +53,17 @@ class CxPlat:
     directory: str
     native: bool
 
+    def xml(self, name: str) -> Path:
+        """Path of a CastXML fixture for this platform."""
+        return HEADERS_DIR / self.directory / name
+
 
 def _make_cfg(target: str) -> CxPlat:
     """target in {'linux','windows'}"""
-    is_native_windows = platform.system() == "Windows"
     if target == "linux":
-        return CxPlat(
-            windows=False, directory="castxml_linux", native=(not is_native_windows)
-        )
+        return CxPlat(windows=False, directory="castxml_linux", native=(not IS_WINDOWS))
     elif target == "windows":
-        return CxPlat(
-            windows=True, directory="castxml_windows", native=is_native_windows
-        )
+        return CxPlat(windows=True, directory="castxml_windows", native=IS_WINDOWS)
     else:
         raise ValueError(f"unknown target: {target}")
 
@@ -31,3 +72,193 @@ def _make_cfg(target: str) -> CxPlat:
 def cxplat(request) -> CxPlat:
     """Parametrized CastXML platform configuration for tests."""
     return _make_cfg(request.param)
+
+
+def _hida_source_digest() -> bytes:
+    """
+    Digest of the hida sources and the interpreter version, so cached parses go
+    stale whenever the parser changes or a pickle would come from another Python.
+    """
+    h = hashlib.sha256(repr(sys.version_info[:2]).encode())
+    for src in sorted(Path(hida.__file__).parent.glob("*.py")):
+        h.update(src.read_bytes())
+    return h.digest()
+
+
+_XML_DIGESTS_KEY = "hida/xml_digests"
+
+
+def _xml_digest(path, known):
+    """
+    Content digest of a fixture. `known` maps path -> [mtime_ns, size, hex digest]
+    from earlier runs; a file whose stat still matches is not read again.
+    Returns (digest, changed) where `changed` tells whether `known` was updated.
+    """
+    st = os.stat(path)
+    stat_key = [st.st_mtime_ns, st.st_size]
+    entry = known.get(path)
+    if entry is not None and entry[:2] == stat_key:
+        return bytes.fromhex(entry[2]), False
+    digest = hashlib.blake2b(Path(path).read_bytes(), digest_size=16).digest()
+    known[path] = stat_key + [digest.hex()]
+    return digest, True
+
+
+def _parse_cached_on_disk(cache_dir, code_digest, xml_digest, path, kwargs):
+    """parse(), reusing a pickle from an earlier run when XML, options and code all match."""
+    h = hashlib.sha256(code_digest)
+    h.update(repr(sorted(kwargs.items())).encode())
+    h.update(xml_digest)
+    pkl = cache_dir / f"{h.hexdigest()}.pkl"
+    try:
+        with open(pkl, "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        pass
+
+    result = parse(path, **kwargs)
+    tmp = pkl.with_suffix(f".{os.getpid()}.tmp")  # xdist workers may race here
+    with open(tmp, "wb") as f:
+        pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, pkl)
+    return result
+
+
+@pytest.fixture(scope="session")
+def parsed_definitions(request):
+    """
+    Memoized `parse(path, **kwargs)`: each (xml, options) pair is parsed once per session.
+    The memo is keyed by XML content, so byte-identical fixtures of different
+    platforms share one parse. Definitions are frozen, so a fresh list sharing
+    them is all callers need.
+    Under pytest-xdist every worker process keeps its own cache.
+
+    Results are also pickled into the pytest cache directory, keyed by the XML
+    bytes, the options and the hida sources, so later runs skip parsing entirely
+    (`--no-parse-cache`, `--cache-clear` or `-p no:cacheprovider` bypass it).
+    XML digests are remembered by (mtime, size), so unchanged fixtures are not
+    even re-read to compute the key.
+    """
+    cache = {}
+    xml_digests = {}  # path -> content digest; fixtures do not change mid-session
+    config_cache = getattr(request.config, "cache", None)
+    if request.config.getoption("--no-parse-cache"):
+        config_cache = None
+    cache_dir = config_cache.mkdir("hida_parsed") if config_cache else None
+    known = config_cache.get(_XML_DIGESTS_KEY, {}) if config_cache else {}
+    known_changed = False
+    code_digest = _hida_source_digest()
+
+    def _get(path, **kwargs):
+        nonlocal known_changed
+        norm = os.path.abspath(path)
+        if norm not in xml_digests:
+            xml_digests[norm], changed = _xml_digest(norm, known)
+            known_changed |= changed
+        key = (xml_digests[norm], frozenset(kwargs.items()))
+        if key not in cache:
+            if cache_dir is None:
+                cache[key] = parse(path, **kwargs)
+            else:
+                cache[key] = _parse_cached_on_disk(
+                    cache_dir, code_digest, key[0], path, kwargs
+                )
+        return list(cache[key])
+
+    yield _get
+
+    if config_cache and known_changed:
+        config_cache.set(_XML_DIGESTS_KEY, known)
+
+
+@pytest.fixture(scope="session")
+def parsed_index(parsed_definitions):
+    """
+    Read-only `index_by_name` over a parsed_definitions result, built once per
+    (xml, options); look names up with `.get(name)`.
+    """
+    cache = {}
+
+    def _get(path, **kwargs):
+        key = (os.path.normpath(path), frozenset(kwargs.items()))
+        if key not in cache:
+            defs = parsed_definitions(path, **kwargs)
+            cache[key] = MappingProxyType(index_by_name(defs))
+        return cache[key]
+
+    return _get
+
+
+@pytest.fixture(scope="session")
+def build_dir(tmp_path_factory):
+    """One scratch directory for every compiler run in the session."""
+    return tmp_path_factory.mktemp("hida_build")
+
+
+@functools.lru_cache(maxsize=None)
+def _compiler_version(compiler):
+    return subprocess.check_output([compiler, "--version"])
+
+
+def _header_digest(cmd, header_code):
+    """Key for "this header already compiled cleanly with this compiler and these flags"."""
+    h = hashlib.sha256(_compiler_version(cmd[0]))
+    h.update(" ".join(cmd).encode())
+    h.update(header_code.encode())
+    return h.hexdigest()
+
+
+@pytest.fixture(scope="session")
+def compile_headers(build_dir, request):
+    """
+    `compile_headers(cmd, headers, stub, cache_key=None)` writes every
+    `stem -> header text` of `headers` as `<stem>.h` next to an include stub
+    `<stem><suffix>` (`stub` is `(suffix, code after the #include)`), and
+    syntax-checks all stubs in one `cmd` run, failing with the stems that broke.
+
+    With a `cache_key`, the digests of headers that compiled are kept in the
+    pytest cache and those headers are not compiled again; only the digests of
+    this call are stored, so headers that no longer exist drop out.
+    """
+    config_cache = getattr(request.config, "cache", None)
+
+    def _compile(cmd, headers, stub, cache_key=None):
+        suffix, stub_code = stub
+        cwd = build_dir / cmd[0]
+        cwd.mkdir(exist_ok=True)
+        cache = config_cache if cache_key else None
+        compiled_ok = set(cache.get(cache_key, [])) if cache else set()
+        digests = {}
+        if cache:
+            digests = {
+                stem: _header_digest(cmd, code) for stem, code in headers.items()
+            }
+
+        sources = {}
+        for stem, header_code in headers.items():
+            if digests.get(stem) in compiled_ok:
+                continue
+            (cwd / f"{stem}.h").write_text(header_code)
+            (cwd / f"{stem}{suffix}").write_text(f'#include "{stem}.h"\n{stub_code}')
+            sources[stem] = f"{stem}{suffix}"
+
+        if sources:
+            result = subprocess.run(
+                cmd + list(sources.values()),
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                cwd=cwd,
+            )
+            if result.returncode != 0:
+                stderr = result.stderr.decode()
+                failed = sorted(
+                    stem
+                    for stem, source in sources.items()
+                    if f"{stem}.h:" in stderr or source in stderr
+                )
+                pytest.fail(f"{cmd[0]} compilation failed for {failed}:\n{stderr}")
+
+        if cache and set(digests.values()) != compiled_ok:
+            cache.set(cache_key, sorted(set(digests.values())))
+
+    return _compile
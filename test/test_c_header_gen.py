@@ -1,15 +1,8 @@
 import os
-import tempfile
-import subprocess
-import sys
+import re
 import pytest
 
-here = os.path.dirname(__file__)
-
-sys.path.insert(0, os.path.join(here, os.pardir))
-
 from hida import (
-    parse,
     validate_definitions,
     filter_by_source_regexes,
     get_system_include_regexes,
@@ -18,75 +11,93 @@ from hida import (
     ClassDefinition,
 )
 
+_SYS_EXCLUDE = get_system_include_regexes()
+_TYPEDEF_KIND = re.compile(r"typedef (struct|enum)\b")
 
-@pytest.mark.parametrize(
-    "filename",
-    [
-        "basic.xml",
-        "class.xml",
-        "basics.xml",
-        "basic_types.xml",
-        "typedefs.xml",
-        "typedef_struct.xml",
-        "namespaces.xml",
-        "pointers.xml",
-        "std_types_pointers.xml",
-        "arrays.xml",
-        "enums.xml",
-        "constants.xml",
-        "all_types.xml",
-        "includes.xml",
-        "unions.xml",
-        "bitfields.xml",
-        "bitfields_basic.xml",
-        "holes_real.xml",
-        "fixed_width.xml",
-        "typedef_remove.xml",
-        "complicated.xml",
-    ],
-)
-def test_c_header_generation(filename, cxplat):
-    xml_path = os.path.join(here, os.pardir, "headers", cxplat.directory, filename)
-    definitions = parse(xml_path, skip_failed_parsing=True, remove_unknown=True)
-    definitions = filter_by_source_regexes(
-        definitions, exclude=get_system_include_regexes()
-    )
-    validate_definitions(definitions)
-
-    # Generate the header
-    header_code = write_c_header_from_definitions(definitions)
-    assert "#pragma once" in header_code
-
-    enums = bool([d for d in definitions if isinstance(d, EnumDefinition)])
-    classes = bool([d for d in definitions if isinstance(d, ClassDefinition)])
-    assert not classes or any(
-        "typedef struct" in line for line in header_code.splitlines()
-    ), "No struct defined"
-    assert (
-        not enums
-        or any("typedef enum" in line for line in header_code.splitlines())
-        or "enum" not in header_code
-    ), "No enum defined"
-
-    with tempfile.TemporaryDirectory() as tmpdir:
-        header_path = os.path.join(tmpdir, "generated.h")
-        source_path = os.path.join(tmpdir, "main.c")
-
-        with open(header_path, "w") as f:
-            f.write(header_code)
-
-        with open(source_path, "w") as f:
-            f.write('#include "generated.h"\n')
-            f.write("int main() { return 0; }\n")
-
-        result = subprocess.run(
-            ["gcc", "-std=c99", "-Wall", "-Werror", source_path],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            cwd=tmpdir,
-        )
-
-        if result.returncode != 0:
-            raise AssertionError(
-                f"C compilation failed for {filename}:\n" + result.stderr.decode()
+_FILENAMES = [
+    "basic.xml",
+    "class.xml",
+    "basics.xml",
+    "basic_types.xml",
+    "typedefs.xml",
+    "typedef_struct.xml",
+    "namespaces.xml",
+    "pointers.xml",
+    "std_types_pointers.xml",
+    "arrays.xml",
+    "enums.xml",
+    "constants.xml",
+    "all_types.xml",
+    "includes.xml",
+    "unions.xml",
+    "bitfields.xml",
+    "bitfields_basic.xml",
+    "holes_real.xml",
+    "fixed_width.xml",
+    "typedef_remove.xml",
+    "complicated.xml",
+]
+
+
+@pytest.fixture(scope="session")
+def c_header(parsed_definitions):
+    """
+    `c_header(filename, cxplat)`: generated C header for one XML. Codegen runs
+    once per (filename, cxplat) for the session; the checks run on every call.
+    """
+    cache = {}
+
+    def _get(filename, cxplat):
+        key = (filename, cxplat)
+        if key not in cache:
+            definitions = parsed_definitions(
+                cxplat.xml(filename), skip_failed_parsing=True, remove_unknown=True
             )
+            definitions = filter_by_source_regexes(definitions, exclude=_SYS_EXCLUDE)
+            validate_definitions(definitions)
+            cache[key] = definitions, write_c_header_from_definitions(definitions)
+        definitions, header_code = cache[key]
+
+        assert "#pragma once" in header_code
+
+        enums = any(isinstance(d, EnumDefinition) for d in definitions)
+        classes = any(isinstance(d, ClassDefinition) for d in definitions)
+        present = set(_TYPEDEF_KIND.findall(header_code))
+        assert not classes or "struct" in present, "No struct defined"
+        assert (
+            not enums or "enum" in present or "enum" not in header_code
+        ), "No enum defined"
+
+        return header_code
+
+    return _get
+
+
+_GCC_CMD = ["gcc", "-std=c99", "-Wall", "-Werror", "-fsyntax-only"]
+_GCC_STUB = ("_main.c", "")
+_COMPILED_OK_KEY = "hida/c_header_compiled_ok"
+
+
+def _stem(filename, cxplat):
+    return f"{cxplat.directory}_{os.path.splitext(filename)[0]}"
+
+
+def test_c_header_generation(cxplat, c_header, compile_headers):
+    """
+    Compile every generated header in a single gcc run; failures are mapped back per file.
+    Headers whose exact text already compiled (pytest cache) are not compiled again.
+    """
+    headers = {
+        _stem(filename, cxplat): c_header(filename, cxplat) for filename in _FILENAMES
+    }
+    compile_headers(
+        _GCC_CMD, headers, _GCC_STUB, f"{_COMPILED_OK_KEY}/{cxplat.directory}"
+    )
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("filename", _FILENAMES)
+def test_c_header_generation_single(filename, cxplat, c_header, compile_headers):
+    """One gcc run per header; slower, but isolates a failing file (--runslow)."""
+    header_code = c_header(filename, cxplat)
+    compile_headers(_GCC_CMD, {_stem(filename, cxplat): header_code}, _GCC_STUB)
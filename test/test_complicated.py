@@ -1,104 +1,93 @@
-import sys
-import os
+from typing import FrozenSet, NamedTuple, Tuple
 
-here = os.path.dirname(__file__)
+from hida import validate_definitions, ClassDefinition, index_by_name
 
-sys.path.insert(0, os.path.join(here, os.pardir))
 
-from hida import parse, validate_definitions, ClassDefinition, find_type_by_name
+class _Expected(NamedTuple):
+    types: FrozenSet[str]  # acceptable type fullnames
+    dims: Tuple[int, ...] = ()  # array dimensions, () for scalars
 
 
-def test_complicated(cxplat):
-    result = parse(
-        os.path.join(here, os.pardir, "headers", cxplat.directory, "complicated.xml"),
+def _expect(*types: str, dims: Tuple[int, ...] = ()) -> _Expected:
+    return _Expected(frozenset(types), dims)
+
+
+def test_complicated(cxplat, parsed_definitions):
+    result = parsed_definitions(
+        cxplat.xml("complicated.xml"),
         use_bool=True,
         skip_failed_parsing=True,
         remove_unknown=True,
     )
 
-    assert isinstance(result, list), "Expected list of parsed definitions"
     validate_definitions(result)
 
-    struct = find_type_by_name(result, "Everything")
+    types = index_by_name(result)
+    struct = types.get("Everything")
     assert struct is not None, "Struct 'Everything' not found"
     assert isinstance(struct, ClassDefinition)
 
     expected_fields = {
         # Basic + fixed-width
-        "i": "int32_t",
-        "f": "float",
-        "b": "bool",
-        "i32": "int32_t",
-        "u64": "uint64_t",
+        "i": _expect("int32_t"),
+        "f": _expect("float"),
+        "b": _expect("bool"),
+        "i32": _expect("int32_t"),
+        "u64": _expect("uint64_t"),
         # Wide chars
-        "wch": ("int32_t", "uint32_t", "int16_t"),
-        "ch16": ("int16_t", "uint16_t"),
-        "ch32": ("int32_t", "uint32_t"),
+        "wch": _expect("int32_t", "uint32_t", "int16_t"),
+        "ch16": _expect("int16_t", "uint16_t"),
+        "ch32": _expect("int32_t", "uint32_t"),
         # Arrays
-        "a1": ("int32_t", (3,)),
-        "a2": ("float", (2, 2)),
-        "a3": ("double", (2, 2, 2)),
-        "a4": ("int8_t", (2, 2, 2, 2)),
+        "a1": _expect("int32_t", dims=(3,)),
+        "a2": _expect("float", dims=(2, 2)),
+        "a3": _expect("double", dims=(2, 2, 2)),
+        "a4": _expect("int8_t", dims=(2, 2, 2, 2)),
         # Pointers
-        "p_i": "void*",
-        "pp_f": "void*",
-        "p_cstr": "void*",
-        "p_void": "void*",
-        "p_str": "void*",
+        "p_i": _expect("void*"),
+        "pp_f": _expect("void*"),
+        "p_cstr": _expect("void*"),
+        "p_void": _expect("void*"),
+        "p_str": _expect("void*"),
         # Function pointers
-        "callback": "void*",
-        "handlers": ("void*", (2,)),
+        "callback": _expect("void*"),
+        "handlers": _expect("void*", dims=(2,)),
         # Typedefs
-        "my_i": "int32_t",
-        "my_ul": "uint32_t" if cxplat.windows else "uint64_t",
-        "fp": "void*",
-        "pt": "void*",
+        "my_i": _expect("int32_t"),
+        "my_ul": _expect("uint32_t" if cxplat.windows else "uint64_t"),
+        "fp": _expect("void*"),
+        "pt": _expect("void*"),
         # "pts": ("Point", (5,)),  # Uncomment if Point is available and properly typed
         # Enums
-        "e1": "SimpleEnum",
-        "e2": "ScopedEnum",
+        "e1": _expect("SimpleEnum"),
+        "e2": _expect("ScopedEnum"),
         # Union
-        "mix": "MixedUnion",
+        "mix": _expect("MixedUnion"),
         # Namespaced
-        "ns": "Outer::Inner::Namespaced",
+        "ns": _expect("Outer::Inner::Namespaced"),
         # Bitfield struct
-        "bits": "BitfieldStruct",
+        "bits": _expect("BitfieldStruct"),
     }
 
     fields_by_name = {f.name: f for f in struct.fields}
 
-    def type_matches(actual_type: "TypeBase", expected):
-        actual = actual_type.fullname
-        if isinstance(expected, (tuple, list)):
-            return actual in expected
-        return actual == expected
-
-    for name, expected in expected_fields.items():
+    for name, (expected_types, expected_dims) in expected_fields.items():
         assert name in fields_by_name, f"Field '{name}' missing from Everything struct"
         field = fields_by_name[name]
 
-        if isinstance(expected, tuple) and isinstance(expected[1], (list, tuple)):
-            expected_type, expected_dims = expected
-            assert type_matches(
-                field.type, expected_type
-            ), f"{name}: expected type {expected_type}, got {field.type.fullname}"
-            assert (
-                field.elements == expected_dims
-            ), f"{name}: expected dimensions {expected_dims}, got {field.elements}"
-        else:
-            assert type_matches(
-                field.type, expected
-            ), f"{name}: expected type {expected}, got {field.type.fullname}"
-            assert (
-                field.elements == ()
-            ), f"{name}: expected scalar, got array {field.elements}"
+        assert (
+            field.type.fullname in expected_types
+        ), f"{name}: expected type {set(expected_types)}, got {field.type.fullname}"
+        assert (
+            field.elements == expected_dims
+        ), f"{name}: expected dimensions {expected_dims}, got {field.elements}"
 
         assert (
             isinstance(field.size_in_bits, int) and field.size_in_bits > 0
         ), f"{name}: invalid bit size"
 
     # Ensure related types exist
-    assert find_type_by_name(result, "MixedUnion"), "Union MixedUnion missing"
-    assert find_type_by_name(result, "ScopedEnum"), "ScopedEnum missing"
-    assert find_type_by_name(result, "SimpleEnum"), "SimpleEnum missing"
-    assert find_type_by_name(result, "Point"), "Typedef Point missing"
+    assert types.get("MixedUnion"), "Union MixedUnion missing"
+    assert types.get("ScopedEnum"), "ScopedEnum missing"
+    assert types.get("SimpleEnum"), "SimpleEnum missing"
+    assert types.get("Point"), "Typedef Point missing"
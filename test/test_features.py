@@ -1,65 +1,42 @@
-import sys
 import os
-
-here = os.path.dirname(__file__)
-
-sys.path.insert(0, os.path.join(here, os.pardir))
+import operator
+import pytest
 
 from hida import (
     EnumDefinition,
     parse,
     validate_definitions,
     find_type_by_name,
+    index_by_name,
     ClassDefinition,
     UnionDefinition,
     ConstantDefinition,
     TypedefDefinition,
     TypeBase,
+    filter_by_source_regexes,
+    get_system_include_regexes,
 )
 
+from hida import cast_xml_parse
 from hida.cast_xml_parse import CastXmlParse
 
+# (name, type, elements, bitoffset, size_in_bits, bitfield)
+_BASIC_EXPECTED = [
+    ("i", TypeBase("int32_t"), (), 0, 32, False),
+    ("f", TypeBase("float"), (), 32, 32, False),
+]
 
-def test_basic(cxplat):
-    result = parse(
-        os.path.join(here, os.pardir, "headers", cxplat.directory, "basic.xml")
-    )
 
-    assert isinstance(result, list), "Expected list of class definitions"
+def test_basic(cxplat, parsed_definitions):
+    result = parsed_definitions(cxplat.xml("basic.xml"))
 
     struct_a = find_type_by_name(result, "A")
     assert struct_a is not None, "Struct A not found"
 
-    expected_fields = [
-        {
-            "name": "i",
-            "type": TypeBase("int32_t"),
-            "elements": (),
-            "bitoffset": 0,
-            "size_in_bits": 32,
-            "bitfield": False,
-        },
-        {
-            "name": "f",
-            "type": TypeBase("float"),
-            "elements": (),
-            "bitoffset": 32,
-            "size_in_bits": 32,
-            "bitfield": False,
-        },
-    ]
-
-    assert len(struct_a.fields) == len(
-        expected_fields
-    ), f"Expected {len(expected_fields)} fields"
-
-    for idx, expected in enumerate(expected_fields):
-        field = struct_a.fields[idx]
-        for key, value in expected.items():
-            actual = getattr(field, key)
-            assert (
-                actual == value
-            ), f"Field '{field.name}' expected {key}={value}, got {actual}"
+    assert [
+        (f.name, f.type, f.elements, f.bitoffset, f.size_in_bits, f.bitfield)
+        for f in struct_a.fields
+    ] == _BASIC_EXPECTED
 
     expected_size = 8  # two 4-byte fields
     assert (
@@ -68,81 +45,121 @@ def test_basic(cxplat):
     validate_definitions(result)
 
 
-def test_class(cxplat):
-    result = parse(
-        os.path.join(here, os.pardir, "headers", cxplat.directory, "class.xml")
-    )
-
-    assert isinstance(result, list), "Expected list of class definitions"
-
-    a = find_type_by_name(result, "A")
-    assert a is not None, "Class A not found"
-    assert len(a.fields) == 2, "A should have 2 fields"
-    assert a.fields[0].name == "i" and a.fields[0].type.fullname == "int32_t"
-    assert a.fields[1].name == "f" and a.fields[1].type.fullname == "float"
-    validate_definitions(result)
-
-
-def test_basics(cxplat):
-    result = parse(
-        os.path.join(here, os.pardir, "headers", cxplat.directory, "basics.xml")
-    )
+_STRUCT_FIELD_CASES = [
+    ("class.xml", "A", [("i", "int32_t", ()), ("f", "float", ())]),
+    ("basics.xml", "A", [("i", "int32_t", ()), ("f", "float", ())]),
+    ("basics.xml", "B", [("i", "int8_t", ()), ("d", "double", ())]),
+    (
+        "basics.xml",
+        "C",
+        [("i", "int8_t", ()), ("us", "uint16_t", ()), ("s", "int16_t", ())],
+    ),
+    ("nested.xml", "A", [("a", "int32_t", ())]),
+    ("nested.xml", "B", [("a", "A", ()), ("b", "int32_t", ())]),
+    ("nested.xml", "C", [("a", "A", ()), ("b", "B", ()), ("c", "int32_t", ())]),
+    (
+        "arrays.xml",
+        "B",
+        [
+            ("s", "A", (2,)),
+            ("a", "int32_t", (10,)),
+            ("b", "int32_t", (2, 3)),
+            ("c", "int32_t", (2, 3, 4)),
+            ("d", "int32_t", (5, 6, 7, 8)),
+        ],
+    ),
+    (
+        "fixed_width.xml",
+        "A",
+        [
+            ("a1", "int8_t", ()),
+            ("a2", "int16_t", ()),
+            ("a3", "int32_t", ()),
+            ("a4", "int64_t", ()),
+            ("a5", "uint8_t", ()),
+            ("a6", "uint16_t", ()),
+            ("a7", "uint32_t", ()),
+            ("a8", "uint64_t", ()),
+        ],
+    ),
+    (
+        "fixed_width.xml",
+        "B",
+        [
+            ("b1", "int8_t", ()),
+            ("b2", "int16_t", ()),
+            ("b3", "int32_t", ()),
+            ("b4", "int64_t", ()),
+            ("b5", "uint8_t", ()),
+            ("b6", "uint16_t", ()),
+            ("b7", "uint32_t", ()),
+            ("b8", "uint64_t", ()),
+        ],
+    ),
+    (
+        "fixed_width.xml",
+        "C",
+        [("arr1", "int32_t", (4,)), ("arr2", "uint64_t", (2, 3))],
+    ),
+    ("fixed_width.xml", "D", [("d1", "uint16_t", (5, 6))]),
+    (
+        "pointers.xml",
+        "Pointers",
+        [
+            ("p_int", "void*", ()),
+            ("pp_float", "void*", ()),
+            ("p_void", "void*", ()),
+            ("p_char", "void*", ()),
+            ("p_const_double", "void*", ()),
+            ("func_ptr", "void*", ()),
+            ("void_func_ptr", "void*", ()),
+            ("arr_func_ptr", "void*", (3,)),
+        ],
+    ),
+]
 
-    assert isinstance(result, list), "Expected list of class definitions"
 
-    a = find_type_by_name(result, "A")
-    assert a is not None, "Struct A not found"
-    assert len(a.fields) == 2
-    assert a.fields[0].name == "i" and a.fields[0].type.fullname == "int32_t"
-    assert a.fields[1].name == "f" and a.fields[1].type.fullname == "float"
+@pytest.mark.parametrize("xml, type_name, expected", _STRUCT_FIELD_CASES)
+def test_struct_fields(cxplat, parsed_definitions, xml, type_name, expected):
+    """(name, type, elements) of every field; each XML is parsed once per session."""
+    result = parsed_definitions(cxplat.xml(xml))
 
-    b = find_type_by_name(result, "B")
-    assert b is not None, "Struct B not found"
-    assert len(b.fields) == 2
-    assert b.fields[0].name == "i" and b.fields[0].type.fullname == "int8_t"
-    assert b.fields[1].name == "d" and b.fields[1].type.fullname == "double"
-
-    c = find_type_by_name(result, "C")
-    assert c is not None, "Class C not found"
-    assert len(c.fields) == 3
-    assert c.fields[0].name == "i" and c.fields[0].type.fullname == "int8_t"
-    assert c.fields[1].name == "us" and c.fields[1].type.fullname == "uint16_t"
-    assert c.fields[2].name == "s" and c.fields[2].type.fullname == "int16_t"
+    struct_def = find_type_by_name(result, type_name)
+    assert struct_def is not None, f"{type_name} not found in {xml}"
+    assert [
+        (f.name, f.type.fullname, f.elements) for f in struct_def.fields
+    ] == expected
     validate_definitions(result)
 
 
-def test_normalize_integral_type():
+@pytest.mark.parametrize(
+    "typename, size_in_bits, use_bool, expected",
+    [
+        ("int", 32, False, "int32_t"),
+        ("unsigned int", 32, False, "uint32_t"),
+        ("short", 16, False, "int16_t"),
+        ("unsigned short", 16, False, "uint16_t"),
+        ("long long", 64, False, "int64_t"),
+        ("unsigned long long", 64, False, "uint64_t"),
+        ("char", 8, False, "int8_t"),
+        ("unsigned char", 8, False, "uint8_t"),
+        # non-integral types are left alone
+        ("float", 32, False, "float"),
+        ("double", 64, False, "double"),
+        ("long double", 128, False, "long double"),
+        ("void*", 64, False, "void*"),
+        ("bool", 8, False, "uint8_t"),
+        ("bool", 8, True, "bool"),
+    ],
+)
+def test_normalize_integral_type(typename, size_in_bits, use_bool, expected):
     fn = CastXmlParse._normalize_integral_type  # staticmethod
+    assert fn(TypeBase(typename), size_in_bits, use_bool=use_bool) == TypeBase(expected)
 
-    assert fn(TypeBase("int"), 32) == TypeBase("int32_t")
-    assert fn(TypeBase("unsigned int"), 32) == TypeBase("uint32_t")
-    assert fn(TypeBase("short"), 16) == TypeBase("int16_t")
-    assert fn(TypeBase("unsigned short"), 16) == TypeBase("uint16_t")
-    assert fn(TypeBase("long long"), 64) == TypeBase("int64_t")
-    assert fn(TypeBase("unsigned long long"), 64) == TypeBase("uint64_t")
-    assert fn(TypeBase("char"), 8) == TypeBase("int8_t")
-    assert fn(TypeBase("unsigned char"), 8) == TypeBase("uint8_t")
-
-    assert fn(TypeBase("float"), 32) == TypeBase("float")
-    assert fn(TypeBase("double"), 64) == TypeBase("double")
-    assert fn(TypeBase("long double"), 128) == TypeBase("long double")
-    assert fn(TypeBase("void*"), 64) == TypeBase("void*")
-
-    assert fn(TypeBase("bool"), 8) == TypeBase("uint8_t")
-    assert fn(TypeBase("bool"), 8, use_bool=True) == TypeBase("bool")
 
-
-def test_all_basic_types(cxplat):
-    result = parse(
-        os.path.join(here, os.pardir, "headers", cxplat.directory, "basic_types.xml")
-    )
-
-    assert isinstance(result, list), "Expected list of class definitions"
-
-    struct_def = find_type_by_name(result, "AllBasicTypes")
-    assert struct_def is not None, "Struct AllBasicTypes not found"
-
-    expected_fields = [
+# keyed by CxPlat.windows: `long` is 32-bit on Windows
+_BASIC_TYPES_EXPECTED = {
+    windows: [
         ("b", TypeBase("uint8_t")),  # or TypeBase("bool") if use_bool=True
         ("c", TypeBase("int8_t")),
         ("sc", TypeBase("int8_t")),
@@ -151,143 +168,45 @@ def test_all_basic_types(cxplat):
         ("us", TypeBase("uint16_t")),
         ("i", TypeBase("int32_t")),
         ("ui", TypeBase("uint32_t")),
-        ("l", TypeBase("int32_t" if cxplat.windows else "int64_t")),
-        ("ul", TypeBase("uint32_t" if cxplat.windows else "uint64_t")),
+        ("l", TypeBase("int32_t" if windows else "int64_t")),
+        ("ul", TypeBase("uint32_t" if windows else "uint64_t")),
         ("ll", TypeBase("int64_t")),
         ("ull", TypeBase("uint64_t")),
         ("f", TypeBase("float")),
         ("d", TypeBase("double")),
         ("ld", TypeBase("long double")),
     ]
+    for windows in (False, True)
+}
 
-    assert len(struct_def.fields) == len(expected_fields)
-
-    for idx, (field_name, expected_type) in enumerate(expected_fields):
-        field = struct_def.fields[idx]
-        assert (
-            field.name == field_name
-        ), f"Expected field '{field_name}', got '{field.name}'"
-        assert (
-            field.type == expected_type
-        ), f"Expected type '{expected_type.fullname}' for '{field_name}', got '{field.c_type.fullname}'"
-
-    validate_definitions(result)
-
-
-def test_nested_structs(cxplat):
-    result = parse(
-        os.path.join(here, os.pardir, "headers", cxplat.directory, "nested.xml")
-    )
-
-    assert isinstance(result, list), "Expected list of class definitions"
 
-    a = find_type_by_name(result, "A")
-    assert a is not None and len(a.fields) == 1
-    assert a.fields[0].name == "a" and a.fields[0].type.fullname == "int32_t"
+def test_all_basic_types(cxplat, parsed_definitions):
+    result = parsed_definitions(cxplat.xml("basic_types.xml"))
 
-    b = find_type_by_name(result, "B")
-    assert b is not None and len(b.fields) == 2
-    assert b.fields[0].name == "a" and b.fields[0].type.fullname == "A"
-    assert b.fields[1].name == "b" and b.fields[1].type.fullname == "int32_t"
+    struct_def = find_type_by_name(result, "AllBasicTypes")
+    assert struct_def is not None, "Struct AllBasicTypes not found"
 
-    c = find_type_by_name(result, "C")
-    assert c is not None and len(c.fields) == 3
-    assert c.fields[0].name == "a" and c.fields[0].type.fullname == "A"
-    assert c.fields[1].name == "b" and c.fields[1].type.fullname == "B"
-    assert c.fields[2].name == "c" and c.fields[2].type.fullname == "int32_t"
+    expected_fields = _BASIC_TYPES_EXPECTED[cxplat.windows]
+    assert [(f.name, f.type) for f in struct_def.fields] == expected_fields
 
     validate_definitions(result)
 
 
-def test_arrays(cxplat):
-    result = parse(
-        os.path.join(here, os.pardir, "headers", cxplat.directory, "arrays.xml")
-    )
-
-    assert isinstance(result, list), "Expected list of class definitions"
-    validate_definitions(result)
+def test_arrays(cxplat, parsed_definitions):
+    result = parsed_definitions(cxplat.xml("arrays.xml"))
 
     b = find_type_by_name(result, "B")
     assert b is not None, "Struct B not found"
-
-    expected_fields = [
-        ("s", "A", (2,)),
-        ("a", "int32_t", (10,)),
-        ("b", "int32_t", (2, 3)),
-        ("c", "int32_t", (2, 3, 4)),
-        ("d", "int32_t", (5, 6, 7, 8)),
-    ]
-
-    assert len(b.fields) == len(
-        expected_fields
-    ), f"Expected {len(expected_fields)} fields"
-
-    for idx, (name, type_str, elements) in enumerate(expected_fields):
-        field = b.fields[idx]
-        assert field.name == name, f"Expected field name '{name}', got '{field.name}'"
-        assert (
-            field.type.fullname == type_str
-        ), f"Expected type '{type_str}', got '{field.type.fullname}'"
-        assert (
-            field.elements == elements
-        ), f"Expected elements {elements}, got {field.elements}"
+    for field in b.fields:
         assert (
             isinstance(field.size_in_bits, int) and field.size_in_bits > 0
-        ), f"Invalid size_in_bits for '{name}'"
+        ), f"Invalid size_in_bits for '{field.name}'"
 
     assert b.size > 0, f"Struct B size must be positive, got {b.size}"
-    validate_definitions(result)
-
-
-def test_pointers(cxplat):
-    result = parse(
-        os.path.join(here, os.pardir, "headers", cxplat.directory, "pointers.xml")
-    )
-
-    assert isinstance(result, list), "Expected list of class definitions"
-    validate_definitions(result)
-
-    struct_def = find_type_by_name(result, "Pointers")
-    assert struct_def is not None, "Struct Pointers not found"
-
-    expected_fields = [
-        ("p_int", "void*"),
-        ("pp_float", "void*"),
-        ("p_void", "void*"),
-        ("p_char", "void*"),
-        ("p_const_double", "void*"),
-        ("func_ptr", "void*"),
-        ("void_func_ptr", "void*"),
-        ("arr_func_ptr", "void*"),
-    ]
-
-    assert len(struct_def.fields) == len(
-        expected_fields
-    ), f"Expected {len(expected_fields)} fields"
-
-    for idx, (name, expected_type) in enumerate(expected_fields):
-        field = struct_def.fields[idx]
-        assert field.name == name, f"Expected field name '{name}', got '{field.name}'"
-        assert (
-            field.type.fullname == expected_type
-        ), f"Expected type '{expected_type}' for field '{name}', got '{field.type.fullname}'"
-        if name == "arr_func_ptr":
-            assert field.elements == (
-                3,
-            ), f"Expected elements (3,) for 'arr_func_ptr', got {field.elements}"
-        else:
-            assert (
-                field.elements == ()
-            ), f"Expected scalar field for '{name}', got elements {field.elements}"
-
-    validate_definitions(result)
 
 
-def test_typedefs(cxplat):
-    result = parse(
-        os.path.join(here, os.pardir, "headers", cxplat.directory, "typedefs.xml")
-    )
-    assert isinstance(result, list), "Expected list of definitions"
+def test_typedefs(cxplat, parsed_definitions, parsed_index):
+    result = parsed_definitions(cxplat.xml("typedefs.xml"))
     validate_definitions(result)
 
     expected_typedefs = {
@@ -309,8 +228,9 @@ def test_typedefs(cxplat):
         "Alias3D": ("int32_t", (2, 3, 4)),
     }
 
+    types = parsed_index(cxplat.xml("typedefs.xml"))
     for name, (expected_type_name, expected_elements) in expected_typedefs.items():
-        typedef = find_type_by_name(result, name)
+        typedef = types.get(name)
         assert typedef is not None, f"Typedef {name} not found"
         if expected_type_name is not None:
             assert (
@@ -321,24 +241,19 @@ def test_typedefs(cxplat):
             typedef.elements == expected_elements
         ), f"{name}: expected elements {expected_elements}, got {typedef.elements}"
 
-    validate_definitions(result)
-
-
-def test_typedef_struct_inline(cxplat):
-    result = parse(
-        os.path.join(here, os.pardir, "headers", cxplat.directory, "typedef_struct.xml")
-    )
 
-    assert isinstance(result, list), "Expected list of definitions"
+def test_typedef_struct_inline(cxplat, parsed_definitions, parsed_index):
+    result = parsed_definitions(cxplat.xml("typedef_struct.xml"))
 
-    typedef = find_type_by_name(result, "Point")
+    types = parsed_index(cxplat.xml("typedef_struct.xml"))
+    typedef = types.get("Point")
     assert typedef is not None, "Typedef 'Point' not found"
     assert isinstance(typedef, TypedefDefinition), "'Point' is not a TypedefDefinition"
     assert typedef.type is not None, "'Point' typedef must have a definition"
     assert typedef.elements == (), "'Point' typedef should not have array dimensions"
 
     # Look for the struct that this typedef refers to
-    struct_def = find_type_by_name(result, typedef.type.fullname)
+    struct_def = types.get(typedef.type.fullname)
     assert struct_def is not None, f"Struct '{typedef.type.fullname}' not found"
     assert isinstance(
         struct_def, ClassDefinition
@@ -349,15 +264,12 @@ def test_typedef_struct_inline(cxplat):
     validate_definitions(result)
 
 
-def test_namespaces(cxplat):
-    result = parse(
-        os.path.join(here, os.pardir, "headers", cxplat.directory, "namespaces.xml")
-    )
-
-    assert isinstance(result, list), "Expected list of class definitions"
+def test_namespaces(cxplat, parsed_definitions, parsed_index):
+    result = parsed_definitions(cxplat.xml("namespaces.xml"))
 
     # Top-level namespace
-    a = find_type_by_name(result, "TopLevel::A")
+    types = parsed_index(cxplat.xml("namespaces.xml"))
+    a = types.get("TopLevel::A")
     assert a is not None, "Struct TopLevel::A not found"
     assert (
         len(a.fields) == 1
@@ -366,7 +278,7 @@ def test_namespaces(cxplat):
     )
 
     # Nested namespace
-    b = find_type_by_name(result, "Outer::Inner::B")
+    b = types.get("Outer::Inner::B")
     assert b is not None, "Struct Outer::Inner::B not found"
     assert (
         len(b.fields) == 1
@@ -385,7 +297,7 @@ def test_namespaces(cxplat):
     )
 
     # Aggregator
-    agg = find_type_by_name(result, "AllNamespaces")
+    agg = types.get("AllNamespaces")
     assert agg is not None, "Struct AllNamespaces not found"
     assert [f.name for f in agg.fields] == ["a", "b", "c"]
     assert agg.fields[0].type.fullname == "TopLevel::A"
@@ -395,16 +307,13 @@ def test_namespaces(cxplat):
     validate_definitions(result)
 
 
-def test_std_types_pointers(cxplat):
-    result = parse(
-        os.path.join(
-            here, os.pardir, "headers", cxplat.directory, "std_types_pointers.xml"
-        ),
+def test_std_types_pointers(cxplat, parsed_definitions):
+    result = parsed_definitions(
+        cxplat.xml("std_types_pointers.xml"),
         skip_failed_parsing=True,
         remove_unknown=True,
     )
 
-    assert isinstance(result, list), "Expected list of class definitions"
     validate_definitions(result)
 
     struct_a = find_type_by_name(result, "A")
@@ -415,26 +324,15 @@ def test_std_types_pointers(cxplat):
         ("s", "void*"),
     ]
 
-    assert len(struct_a.fields) == len(
-        expected_fields
-    ), f"Expected {len(expected_fields)} fields"
-
-    for idx, (name, expected_type) in enumerate(expected_fields):
-        field = struct_a.fields[idx]
-        assert field.name == name, f"Expected field '{name}', got '{field.name}'"
-        assert (
-            field.type.fullname == expected_type
-        ), f"Field '{name}' expected type '{expected_type}', got '{field.type.fullname}'"
-        assert field.elements == (), f"Field '{name}' should not be an array"
+    assert [(f.name, f.type.fullname) for f in struct_a.fields] == expected_fields
+    assert all(f.elements == () for f in struct_a.fields), "Unexpected array field"
 
 
-def test_remove_unknown_behavior(cxplat):
-    xml_path = os.path.join(
-        here, os.pardir, "headers", cxplat.directory, "std_types.xml"
-    )
+def test_remove_unknown_behavior(cxplat, parsed_definitions):
+    xml_path = cxplat.xml("std_types.xml")
 
     # ✅ Case: skip_failed_parsing and remove_unknown enabled — should work
-    result = parse(
+    result = parsed_definitions(
         xml_path,
         do_not_ignore_system=True,
         skip_failed_parsing=True,
@@ -446,87 +344,36 @@ def test_remove_unknown_behavior(cxplat):
     assert "B" in names, "Struct B should be present"
 
     #  Case: strict mode — allow error to propagate
-    try:
-        result = parse(xml_path, skip_failed_parsing=False, remove_unknown=False)
-
-        assert False, "Expected exception due to unknown std::string"
-    except Exception:
-        pass  # Expected
+    with pytest.raises(RuntimeError, match="Failed to extract data"):
+        parse(xml_path, skip_failed_parsing=False, remove_unknown=False)
 
     #  Case: skip_failed only — A skipped, B stays
-    result = parse(xml_path, skip_failed_parsing=True, remove_unknown=False)
+    result = parsed_definitions(
+        xml_path, skip_failed_parsing=True, remove_unknown=False
+    )
     names = {d.name for d in result if hasattr(d, "name")}
     assert "B" in names, "Struct B should be present in skip_failed mode"
 
 
-def test_fixed_width_structs(cxplat):
-    result = parse(
-        os.path.join(here, os.pardir, "headers", cxplat.directory, "fixed_width.xml")
-    )
+def test_fixed_width_structs(cxplat, parsed_definitions, parsed_index):
+    result = parsed_definitions(cxplat.xml("fixed_width.xml"))
 
-    assert isinstance(result, list), "Expected list of class definitions"
     validate_definitions(result)
 
-    expected_structs = {
-        "A": [
-            ("a1", "int8_t", ()),
-            ("a2", "int16_t", ()),
-            ("a3", "int32_t", ()),
-            ("a4", "int64_t", ()),
-            ("a5", "uint8_t", ()),
-            ("a6", "uint16_t", ()),
-            ("a7", "uint32_t", ()),
-            ("a8", "uint64_t", ()),
-        ],
-        "B": [
-            ("b1", "int8_t", ()),
-            ("b2", "int16_t", ()),
-            ("b3", "int32_t", ()),
-            ("b4", "int64_t", ()),
-            ("b5", "uint8_t", ()),
-            ("b6", "uint16_t", ()),
-            ("b7", "uint32_t", ()),
-            ("b8", "uint64_t", ()),
-        ],
-        "C": [
-            ("arr1", "int32_t", (4,)),
-            ("arr2", "uint64_t", (2, 3)),
-        ],
-        "D": [
-            ("d1", "uint16_t", (5, 6)),
-        ],
-    }
-
-    for struct_name, expected_fields in expected_structs.items():
-        s = find_type_by_name(result, struct_name)
+    types = parsed_index(cxplat.xml("fixed_width.xml"))
+    for struct_name in ("A", "B", "C", "D"):
+        s = types.get(struct_name)
         assert s is not None, f"Struct {struct_name} not found"
-        assert len(s.fields) == len(
-            expected_fields
-        ), f"{struct_name}: Expected {len(expected_fields)} fields"
-
-        for idx, (name, expected_type, elements) in enumerate(expected_fields):
-            field = s.fields[idx]
-            assert (
-                field.name == name
-            ), f"{struct_name}.{name}: expected name '{name}', got '{field.name}'"
-            assert (
-                field.type.fullname == expected_type
-            ), f"{struct_name}.{name}: expected type '{expected_type}', got '{field.type.fullname}'"
-            assert (
-                field.elements == elements
-            ), f"{struct_name}.{name}: expected elements {elements}, got {field.elements}"
+        for field in s.fields:
             assert (
                 isinstance(field.size_in_bits, int) and field.size_in_bits > 0
-            ), f"{struct_name}.{name}: invalid size_in_bits"
+            ), f"{struct_name}.{field.name}: invalid size_in_bits"
         assert s.size > 0, f"{struct_name}: size must be positive"
 
 
-def test_enums(cxplat):
-    result = parse(
-        os.path.join(here, os.pardir, "headers", cxplat.directory, "enums.xml")
-    )
+def test_enums(cxplat, parsed_definitions):
+    result = parsed_definitions(cxplat.xml("enums.xml"))
 
-    assert isinstance(result, list), "Expected list of definitions"
     validate_definitions(result)
 
     expected_enums = {
@@ -567,14 +414,15 @@ def test_enums(cxplat):
         },
     }
 
+    enums = [d for d in result if isinstance(d, EnumDefinition)]
+    enums_by_name = {}
+    for d in enums:
+        enums_by_name.setdefault(d.name, d)
+
     for expected_name, enum_data in expected_enums.items():
-        match = None
-        for d in result:
-            if isinstance(d, EnumDefinition) and (
-                d.name == expected_name or d.name.startswith(expected_name)
-            ):
-                match = d
-                break
+        match = enums_by_name.get(expected_name) or next(
+            (d for d in enums if d.name.startswith(expected_name)), None
+        )
         assert match is not None, f"Enum '{expected_name}' not found"
         assert (
             match.size == enum_data["size"]
@@ -583,23 +431,21 @@ def test_enums(cxplat):
         assert parsed == enum_data["values"], f"Enum '{match.name}' values do not match"
 
 
-def test_unions(cxplat):
-    result = parse(
-        os.path.join(here, os.pardir, "headers", cxplat.directory, "unions.xml")
-    )
+def test_unions(cxplat, parsed_definitions, parsed_index):
+    result = parsed_definitions(cxplat.xml("unions.xml"))
 
-    assert isinstance(result, list), "Expected list of class and union definitions"
     validate_definitions(result)
 
     # Test simple union
-    u = find_type_by_name(result, "IntOrFloat")
+    types = parsed_index(cxplat.xml("unions.xml"))
+    u = types.get("IntOrFloat")
     assert u is not None, "Union IntOrFloat not found"
     assert isinstance(u, UnionDefinition)
     assert len(u.fields) == 2
-    assert set(f.name for f in u.fields) == {"i", "f"}
+    assert {f.name for f in u.fields} == {"i", "f"}
 
     # Test struct with named union
-    packet = find_type_by_name(result, "Packet")
+    packet = types.get("Packet")
     assert packet is not None, "Struct Packet not found"
     assert isinstance(packet, ClassDefinition)
     assert any(
@@ -607,17 +453,17 @@ def test_unions(cxplat):
     ), "Expected union field 'data' in Packet"
 
     # Test struct with anonymous union
-    mixed = find_type_by_name(result, "Mixed")
+    mixed = types.get("Mixed")
     assert mixed is not None, "Struct Mixed not found"
     assert isinstance(mixed, ClassDefinition)
-    anon = find_type_by_name(result, mixed.fields[1].type.fullname)
+    anon = types.get(mixed.fields[1].type.fullname)
     assert anon is not None, "Mixed anon union not found"
-    assert set(f.name for f in anon.fields).intersection(
-        {"d", "l"}
+    assert not {f.name for f in anon.fields}.isdisjoint(
+        ("d", "l")
     ), "Missing anonymous union fields in Mixed"
 
     # Test nested union
-    nested_union = find_type_by_name(result, "NestedUnion")
+    nested_union = types.get("NestedUnion")
     assert nested_union is not None, "NestedUnion not found"
     assert isinstance(nested_union, UnionDefinition)
     assert any(
@@ -625,7 +471,7 @@ def test_unions(cxplat):
     ), "Missing nested struct in NestedUnion"
 
     # Test deep union
-    deep = find_type_by_name(result, "DeepUnion")
+    deep = types.get("DeepUnion")
     assert deep is not None, "DeepUnion not found"
     assert isinstance(deep, UnionDefinition)
     assert any(
@@ -633,14 +479,9 @@ def test_unions(cxplat):
     ), "Missing structured field in DeepUnion"
 
 
-def test_bitfields(cxplat):
-    result = parse(
-        os.path.join(
-            here, os.pardir, "headers", cxplat.directory, "bitfields_basic.xml"
-        )
-    )
+def test_bitfields(cxplat, parsed_definitions):
+    result = parsed_definitions(cxplat.xml("bitfields_basic.xml"))
 
-    assert isinstance(result, list), "Expected list of class definitions"
     validate_definitions(result)
 
     s = find_type_by_name(result, "StatusFlags")
@@ -653,36 +494,19 @@ def test_bitfields(cxplat):
         ("reserved", "uint32_t", 6, True),
     ]
 
-    assert len(s.fields) == len(
-        expected_fields
-    ), f"Expected {len(expected_fields)} fields"
-
-    for idx, (name, expected_type, size_in_bits, bitfield) in enumerate(
-        expected_fields
-    ):
-        f = s.fields[idx]
-        assert f.name == name, f"Field {idx} expected name '{name}', got '{f.name}'"
-        assert (
-            f.type.fullname == expected_type
-        ), f"Field '{name}' expected type '{expected_type}', got '{f.type.fullname}'"
-        assert (
-            f.size_in_bits == size_in_bits
-        ), f"Field '{name}' expected size {size_in_bits}, got {f.size_in_bits}"
-        assert (
-            f.bitfield == bitfield
-        ), f"Field '{name}' expected bitfield={bitfield}, got {f.bitfield}"
+    assert [
+        (f.name, f.type.fullname, f.size_in_bits, f.bitfield) for f in s.fields
+    ] == expected_fields
 
 
-def test_bitfields_complex(cxplat):
-    result = parse(
-        os.path.join(here, os.pardir, "headers", cxplat.directory, "bitfields.xml")
-    )
+def test_bitfields_complex(cxplat, parsed_definitions, parsed_index):
+    result = parsed_definitions(cxplat.xml("bitfields.xml"))
 
-    assert isinstance(result, list), "Expected list of class definitions"
     validate_definitions(result)
 
     # --- StatusFlags ---
-    status = find_type_by_name(result, "StatusFlags")
+    types = parsed_index(cxplat.xml("bitfields.xml"))
+    status = types.get("StatusFlags")
     assert status is not None and len(status.fields) == 3
     assert [
         (f.name, f.type.fullname, f.size_in_bits, f.bitfield) for f in status.fields
@@ -693,7 +517,7 @@ def test_bitfields_complex(cxplat):
     ]
 
     # --- ControlRegister ---
-    ctrl = find_type_by_name(result, "ControlRegister")
+    ctrl = types.get("ControlRegister")
     assert ctrl is not None and len(ctrl.fields) == 4
     assert [
         (f.name, f.type.fullname, f.size_in_bits, f.bitfield) for f in ctrl.fields
@@ -705,7 +529,7 @@ def test_bitfields_complex(cxplat):
     ]
 
     # --- Packed32 ---
-    packed = find_type_by_name(result, "Packed32")
+    packed = types.get("Packed32")
     assert packed is not None and len(packed.fields) == 4
     assert [(f.name, f.size_in_bits) for f in packed.fields] == [
         ("a", 8),
@@ -715,42 +539,32 @@ def test_bitfields_complex(cxplat):
     ]
 
     # --- Nested ---
-    nested = find_type_by_name(result, "Nested")
+    nested = types.get("Nested")
     assert nested is not None
     outer_field = next((f for f in nested.fields if f.name == "outer"), None)
-    inner_field = next((f for f in nested.fields if f.name == "inner"), None)
-    assert (
-        outer_field is not None
-        and outer_field.size_in_bits == 4
-        and outer_field.bitfield
-    )
+    assert outer_field is not None
+    assert (outer_field.size_in_bits, outer_field.bitfield) == (4, True)
 
     # --- Flat ---
-    flat = find_type_by_name(result, "Flat")
+    flat = types.get("Flat")
     assert flat is not None
-    field_names = set(f.name for f in flat.fields)
-    assert "top" in field_names
+    assert any(f.name == "top" for f in flat.fields)
 
-    nested = find_type_by_name(result, flat.fields[1].type.fullname)
+    nested = types.get(flat.fields[1].type.fullname)
     assert nested is not None, "Nested struct not found"
     assert nested.fields[1].name == "raw", "Nested raw field not found"
 
-    nested2 = find_type_by_name(result, nested.fields[0].type.fullname)
+    nested2 = types.get(nested.fields[0].type.fullname)
     assert nested2 is not None, "Nested inner struct not found"
-    assert nested2.fields[0].name == "u1"
-    assert nested2.fields[0].bitfield is True
-    assert nested2.fields[0].size_in_bits == 3
-    assert nested2.fields[1].name == "u2"
-    assert nested2.fields[1].bitfield is True
-    assert nested2.fields[1].size_in_bits == 5
+    assert [(f.name, f.bitfield, f.size_in_bits) for f in nested2.fields[:2]] == [
+        ("u1", True, 3),
+        ("u2", True, 5),
+    ]
 
 
-def test_constants(cxplat):
-    result = parse(
-        os.path.join(here, os.pardir, "headers", cxplat.directory, "constants.xml")
-    )
+def test_constants(cxplat, parsed_definitions, parsed_index):
+    result = parsed_definitions(cxplat.xml("constants.xml"))
 
-    assert isinstance(result, list), "Expected list of definitions"
     validate_definitions(result)
 
     expected_constants = {
@@ -762,8 +576,9 @@ def test_constants(cxplat):
         "null_ptr": ("void*", 0),
     }
 
+    types = parsed_index(cxplat.xml("constants.xml"))
     for name, (expected_type, expected_value) in expected_constants.items():
-        const = find_type_by_name(result, name)
+        const = types.get(name)
         assert const is not None, f"Constant '{name}' not found"
         assert isinstance(
             const, ConstantDefinition
@@ -776,12 +591,9 @@ def test_constants(cxplat):
         ), f"{name}: expected value '{expected_value}', got '{const.value}'"
 
 
-def test_struct_packing(cxplat):
-    result = parse(
-        os.path.join(here, os.pardir, "headers", cxplat.directory, "packing.xml")
-    )
+def test_struct_packing(cxplat, parsed_definitions, parsed_index):
+    result = parsed_definitions(cxplat.xml("packing.xml"))
 
-    assert isinstance(result, list), "Expected list of definitions"
     validate_definitions(result)
 
     expected_structs = {
@@ -791,8 +603,9 @@ def test_struct_packing(cxplat):
         "Packed4": (4, 8),  # same layout as default on 4-byte alignment
     }
 
+    types = parsed_index(cxplat.xml("packing.xml"))
     for name, (expected_align, expected_size) in expected_structs.items():
-        struct = find_type_by_name(result, name)
+        struct = types.get(name)
         assert struct is not None, f"Struct '{name}' not found"
         assert (
             struct.alignment == expected_align
@@ -802,14 +615,16 @@ def test_struct_packing(cxplat):
         ), f"{name}: expected size {expected_size}, got {struct.size}"
 
 
-def test_all_basic_types_struct(cxplat):
-    result = parse(
-        os.path.join(here, os.pardir, "headers", cxplat.directory, "all_types.xml"),
+_NAME_TYPE_SIZE = operator.attrgetter("name", "type.fullname", "size_in_bits")
+
+
+def test_all_basic_types_struct(cxplat, parsed_definitions):
+    result = parsed_definitions(
+        cxplat.xml("all_types.xml"),
         skip_failed_parsing=True,
         remove_unknown=True,
     )
 
-    assert isinstance(result, list), "Expected list of definitions"
     validate_definitions(result)
 
     struct = find_type_by_name(result, "AllTypes")
@@ -817,8 +632,7 @@ def test_all_basic_types_struct(cxplat):
     assert isinstance(struct, ClassDefinition)
 
     # Allow platform-dependent width aliases
-    def is_equiv(actual_type, expected):
-        actual = actual_type.fullname
+    def is_equiv(actual, expected):
         if isinstance(expected, (tuple, list)):
             return actual in expected
         return actual == expected
@@ -857,27 +671,25 @@ def test_all_basic_types_struct(cxplat):
         expected_fields
     ), f"Expected {len(expected_fields)} fields, got {len(struct.fields)}"
 
-    for idx, (name, expected_type) in enumerate(expected_fields):
-        field = struct.fields[idx]
-        assert (
-            field.name == name
-        ), f"Field {idx} name mismatch: expected '{name}', got '{field.name}'"
-        assert is_equiv(
-            field.type, expected_type
-        ), f"Field '{name}' type mismatch: expected '{expected_type}', got '{field.type.fullname}'"
-        assert (
-            isinstance(field.size_in_bits, int) and field.size_in_bits > 0
-        ), f"Field '{name}' has invalid size"
+    actual = list(map(_NAME_TYPE_SIZE, struct.fields))
+    assert [a[0] for a in actual] == [e[0] for e in expected_fields]
+    mismatched = [
+        (name, actual_type, expected_type)
+        for (name, actual_type, _), (_, expected_type) in zip(actual, expected_fields)
+        if not is_equiv(actual_type, expected_type)
+    ]
+    assert not mismatched, f"Type mismatches (name, got, expected): {mismatched}"
+    bad_sizes = [a[0] for a in actual if not (isinstance(a[2], int) and a[2] > 0)]
+    assert not bad_sizes, f"Fields with invalid size: {bad_sizes}"
 
 
-def test_includes(cxplat):
-    result = parse(
-        os.path.join(here, os.pardir, "headers", cxplat.directory, "includes.xml"),
+def test_includes(cxplat, parsed_definitions):
+    result = parsed_definitions(
+        cxplat.xml("includes.xml"),
         skip_failed_parsing=True,
         remove_unknown=True,
     )
 
-    assert isinstance(result, list), "Expected list of definitions"
     validate_definitions(result)
 
     struct = find_type_by_name(result, "TestStruct")
@@ -895,3 +707,68 @@ def test_includes(cxplat):
         isinstance(field.size_in_bits, int) and field.size_in_bits > 0
     ), "Invalid size_in_bits"
     assert not field.bitfield, "Expected 'id' not to be a bitfield"
+
+
+def test_index_by_name(cxplat, parsed_definitions):
+    result = parsed_definitions(cxplat.xml("namespaces.xml"))
+
+    types = index_by_name(result)
+    names = {d.name for d in result} | {d.fullname for d in result} | {"missing"}
+    for name in names:
+        assert types.get(name) is find_type_by_name(result, name), name
+
+
+def test_parse_backends_agree(cxplat, monkeypatch):
+    pytest.importorskip("lxml")
+    xml_path = cxplat.xml("complicated.xml")
+    with_lxml = CastXmlParse(use_bool=True).parse_xml(xml_path)
+
+    monkeypatch.setattr(cast_xml_parse, "lxml_etree", None)
+    assert CastXmlParse(use_bool=True).parse_xml(xml_path) == with_lxml
+
+
+def test_parse_memoized_until_file_changes(cxplat, tmp_path):
+    xml_path = tmp_path / "basic.xml"
+    xml_path.write_bytes(cxplat.xml("basic.xml").read_bytes())
+
+    first = parse(xml_path)
+    assert isinstance(first, list), "parse() returns a plain list"
+    second = parse(xml_path)
+    assert second == first and second is not first
+    assert all(a is b for a, b in zip(first, second))
+
+    st = os.stat(xml_path)
+    os.utime(xml_path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    reparsed = parse(xml_path)
+    assert reparsed == first
+    assert not any(a is b for a, b in zip(first, reparsed))
+
+
+def test_parse_uncached_for_verbose_and_unhashable_options(cxplat):
+    xml_path = cxplat.xml("basic.xml")
+    regexes = get_system_include_regexes()
+
+    # a set is unhashable: parsed without the memo instead of raising TypeError
+    from_set = parse(xml_path, exclude_sources=set(regexes))
+    assert from_set == parse(xml_path, exclude_sources=regexes)
+    assert not any(
+        a is b for a, b in zip(from_set, parse(xml_path, exclude_sources=set(regexes)))
+    )
+
+    # verbose parses every time, so its warnings are not swallowed by the memo
+    first = parse(xml_path, verbose=True)
+    again = parse(xml_path, verbose=True)
+    assert first and first == again
+    assert not any(a is b for a, b in zip(first, again))
+
+
+def test_parse_exclude_sources_matches_post_filter(cxplat):
+    regexes = get_system_include_regexes()
+    post_filtered = filter_by_source_regexes(
+        CastXmlParse(skip_failed_parsing=True).parse_xml(cxplat.xml("includes.xml")),
+        exclude=regexes,
+    )
+    pruned = CastXmlParse(skip_failed_parsing=True, exclude_sources=regexes).parse_xml(
+        cxplat.xml("includes.xml")
+    )
+    assert pruned == post_filtered
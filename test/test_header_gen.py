@@ -1,18 +1,9 @@
 import os
-import tempfile
-import subprocess
 import pytest
-import sys
-
-here = os.path.dirname(__file__)
-
-sys.path.insert(0, os.path.join(here, os.pardir))
 
 from hida import (
-    parse,
     validate_definitions,
     write_header_from_definitions,
-    filter_by_source_regexes,
     get_system_include_regexes,
     EnumDefinition,
     ClassDefinition,
@@ -20,78 +11,92 @@ from hida import (
     UnionDefinition,
 )
 
-
-here = os.path.dirname(__file__)
-
-
-def load_convert_compile_header(header_basename: str, cxplat):
-    xml_path = os.path.join(
-        here, os.pardir, "headers", cxplat.directory, header_basename
+_FILENAMES = [
+    "basic.xml",
+    "class.xml",
+    "basic_types.xml",
+    "typedefs.xml",
+    "typedef_struct.xml",
+    "pointers.xml",
+    "arrays.xml",
+    "unions.xml",
+    "enums.xml",
+    "constants.xml",
+    "bitfields.xml",
+    "bitfields_basic.xml",
+    "fixed_width.xml",
+    "complicated.xml",
+]
+
+_SYS_EXCLUDE = tuple(get_system_include_regexes())
+_GXX_CMD = ["g++", "-std=c++17", "-fsyntax-only"]
+_GXX_STUB = ("_check.cpp", "int main() { return 0; }\n")
+_COMPILED_OK_KEY = "hida/cpp_header_compiled_ok"
+
+
+@pytest.fixture(scope="session")
+def cpp_header(parsed_definitions):
+    """
+    `cpp_header(filename, cxplat)`: generated C++ header for one XML. Codegen
+    runs once per (filename, cxplat) for the session; the checks run on every call.
+    """
+    cache = {}
+
+    def _get(header_basename, cxplat):
+        key = (header_basename, cxplat)
+        if key not in cache:
+            # Parse, pruning system-header declarations before they are built
+            result = parsed_definitions(
+                cxplat.xml(header_basename),
+                use_bool=True,
+                skip_failed_parsing=True,
+                remove_unknown=True,
+                exclude_sources=_SYS_EXCLUDE,
+            )
+            validate_definitions(result)
+            cache[key] = result, write_header_from_definitions(result)
+        result, header_code = cache[key]
+
+        assert header_code.strip(), "Generated header is empty"
+
+        # Sanity: check that some type names appear in the header
+        type_names = [
+            d.name
+            for d in result
+            if isinstance(d, (ClassDefinition, UnionDefinition, EnumDefinition))
+        ]
+        if type_names:
+            for name in type_names[:5]:  # Check presence of first few
+                assert (
+                    name in header_code
+                ), f"Expected type name '{name}' not found in generated header"
+
+        return header_code
+
+    return _get
+
+
+def _stem(filename, cxplat):
+    return f"{cxplat.directory}_{os.path.splitext(filename)[0]}"
+
+
+def test_generated_headers_compile(cxplat, cpp_header, compile_headers):
+    """
+    All headers of a platform in one g++ run (one translation unit each).
+    Headers whose exact text already compiled (pytest cache) are not compiled again.
+    """
+    headers = {
+        _stem(filename, cxplat): cpp_header(filename, cxplat)
+        for filename in _FILENAMES
+    }
+    compile_headers(
+        _GXX_CMD, headers, _GXX_STUB, f"{_COMPILED_OK_KEY}/{cxplat.directory}"
     )
 
-    # Parse
-    result = parse(
-        xml_path, use_bool=True, skip_failed_parsing=True, remove_unknown=True
-    )
-    result = filter_by_source_regexes(result, exclude=get_system_include_regexes())
-    validate_definitions(result)
-
-    header_code = write_header_from_definitions(result)
-    assert header_code.strip(), "Generated header is empty"
-
-    # Sanity: check that some type names appear in the header
-    type_names = [
-        d.name
-        for d in result
-        if isinstance(d, (ClassDefinition, UnionDefinition, EnumDefinition))
-    ]
-    if type_names:
-        for name in type_names[:5]:  # Check presence of first few
-            assert (
-                name in header_code
-            ), f"Expected type name '{name}' not found in generated header"
-
-    with tempfile.TemporaryDirectory() as tmpdir:
-        header_file = os.path.join(tmpdir, "generated.h")
-        cpp_file = os.path.join(tmpdir, "check_compile.cpp")
-
-        with open(header_file, "w") as f:
-            f.write(header_code)
-
-        with open(cpp_file, "w") as f:
-            f.write('#include "generated.h"\nint main() { return 0; }\n')
-
-        try:
-            subprocess.run(
-                ["g++", "-std=c++17", "-fsyntax-only", cpp_file],
-                check=True,
-                stderr=subprocess.PIPE,
-                cwd=tmpdir,
-            )
-        except subprocess.CalledProcessError as e:
-            raise RuntimeError(f"g++ compilation failed:\n{e.stderr.decode()}")
-
-    return result
-
-
-@pytest.mark.parametrize(
-    "filename",
-    [
-        "basic.xml",
-        "class.xml",
-        "basic_types.xml",
-        "typedefs.xml",
-        "typedef_struct.xml",
-        "pointers.xml",
-        "arrays.xml",
-        "unions.xml",
-        "enums.xml",
-        "constants.xml",
-        "bitfields.xml",
-        "bitfields_basic.xml",
-        "fixed_width.xml",
-        "complicated.xml",
-    ],
-)
-def test_generated_header_compiles(filename, cxplat):
-    load_convert_compile_header(filename, cxplat)
+
+@pytest.mark.slow
+@pytest.mark.parametrize("filename", _FILENAMES)
+def test_generated_header_compiles(filename, cxplat, cpp_header, compile_headers):
+    """One g++ run per header; slower, but isolates a failing file (--runslow)."""
+    header_code = cpp_header(filename, cxplat)
+    compile_headers(_GXX_CMD, {_stem(filename, cxplat): header_code}, _GXX_STUB)
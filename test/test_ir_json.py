@@ -1,16 +1,13 @@
-import sys
-import os
+import json
 
-here = os.path.dirname(__file__)
+import pytest
 
-sys.path.insert(0, os.path.join(here, os.pardir))
+from hida import dumps, loads, ir_json, ConstantDefinition, TypeBase
 
-from hida import parse, dumps, loads
 
-
-def test_ir_json(cxplat):
-    result = parse(
-        os.path.join(here, os.pardir, "headers", cxplat.directory, "complicated.xml"),
+def test_ir_json(cxplat, parsed_definitions):
+    result = parsed_definitions(
+        cxplat.xml("complicated.xml"),
         use_bool=True,
         skip_failed_parsing=True,
         remove_unknown=True,
@@ -19,3 +16,53 @@ def test_ir_json(cxplat):
     ir = dumps(result)
     result2 = loads(ir)
     assert result == result2
+
+
+def test_ir_json_stdlib_fallback(cxplat, parsed_definitions, monkeypatch):
+    result = parsed_definitions(
+        cxplat.xml("complicated.xml"),
+        use_bool=True,
+        skip_failed_parsing=True,
+        remove_unknown=True,
+    )
+    ir = dumps(result)
+
+    monkeypatch.setattr(ir_json, "orjson", None)
+    assert json.loads(dumps(result)) == json.loads(ir)
+    assert loads(ir) == result
+
+
+@pytest.mark.parametrize("indent", [2, None, 4])
+def test_ir_json_text_independent_of_backend(
+    cxplat, parsed_definitions, monkeypatch, indent
+):
+    """dumps() text must not change with the optional orjson extra."""
+    if ir_json.orjson is None:
+        pytest.skip("orjson not installed")
+    result = parsed_definitions(
+        cxplat.xml("complicated.xml"),
+        use_bool=True,
+        skip_failed_parsing=True,
+        remove_unknown=True,
+    )
+    with_orjson = dumps(result, indent=indent)
+
+    monkeypatch.setattr(ir_json, "orjson", None)
+    assert dumps(result, indent=indent) == with_orjson
+
+
+@pytest.mark.parametrize("backend", ["orjson", "stdlib"])
+@pytest.mark.parametrize(
+    "value", [float("inf"), float("-inf"), 1 << 70, -(1 << 70)], ids=repr
+)
+def test_ir_json_out_of_range_values(backend, value, monkeypatch):
+    """Values orjson cannot represent still round-trip, whichever codec is active."""
+    if backend == "stdlib":
+        monkeypatch.setattr(ir_json, "orjson", None)
+    elif ir_json.orjson is None:
+        pytest.skip("orjson not installed")
+
+    const = ConstantDefinition(
+        name="BIG", type=TypeBase(name="double"), value=value, source="big.h:1"
+    )
+    assert loads(dumps([const])) == [const]
@@ -1,45 +1,53 @@
-import os
 import pytest
 from typing import List
+from dataclasses import replace
 from pathlib import Path, PurePath
 import re
 import pytest
-from types import SimpleNamespace
+from types import ModuleType, SimpleNamespace
 
 from hida import (
-    parse,
     find_type_by_name,
+    index_by_name,
     validate_definitions,
     filter_by_source_regexes,
     filter_by_name_regexes,
     fill_bitfield_holes_with_padding,
     fill_struct_holes_with_padding_bytes,
+    reorder_fields_min_padding,
     flatten_namespaces,
     resolve_typedefs,
     filter_connected_definitions,
     DefinitionBase,
     ClassDefinition,
+    EnumDefinition,
     UnionDefinition,
+    Field,
+    TypeBase,
     flatten_structs,
     remove_enums,
     remove_source,
+    generate_python_code_from_definitions,
+    verify_struct_sizes,
+)
+from hida.manipulate import (
+    build_type_dependency_graph,
+    sort_definitions_topologically,
 )
-
-here = os.path.dirname(__file__)
 
 
-def test_fill_bitfield_holes_with_padding(cxplat):
+def test_fill_bitfield_holes_with_padding(cxplat, parsed_definitions, parsed_index):
     # Parse the header
-    result = parse(
-        os.path.join(
-            here, os.pardir, "headers", cxplat.directory, "bitfield_holes.xml"
-        ),
+    xml_path = cxplat.xml("bitfield_holes.xml")
+    result = parsed_definitions(
+        xml_path,
         skip_failed_parsing=True,
         remove_unknown=True,
     )
+    types = parsed_index(xml_path, skip_failed_parsing=True, remove_unknown=True)
 
     # Find the "Holey" struct before filling
-    holey = find_type_by_name(result, "Holey")
+    holey = types.get("Holey")
     assert holey is not None and isinstance(holey, ClassDefinition)
 
     # Count original bitfields
@@ -57,7 +65,7 @@ def test_fill_bitfield_holes_with_padding(cxplat):
     assert len(bitfields) > 3, "Padding bitfields were not inserted"
 
     # Look for the synthetic padding field
-    pads = [f for f in bitfields if f.name.startswith("__pad")]
+    pads = [f for f in bitfields if f.padding]
     assert len(pads) >= 1, "Expected at least one __pad field"
 
     # Verify the pad fills the correct hole
@@ -66,7 +74,7 @@ def test_fill_bitfield_holes_with_padding(cxplat):
     ), "Expected 23-bit padding in Holey struct"
 
     # Also check Packed has no padding
-    packed = find_type_by_name(result, "Packed")
+    packed = types.get("Packed")
     before = len(packed.fields)
     fill_bitfield_holes_with_padding([packed])
     after = len(packed.fields)
@@ -75,20 +83,22 @@ def test_fill_bitfield_holes_with_padding(cxplat):
     validate_definitions(result)
 
 
-def test_fill_struct_holes_with_padding_bytes_multiple_structs(cxplat):
-    result = parse(
-        os.path.join(here, os.pardir, "headers", cxplat.directory, "holes_real.xml"),
+def test_fill_struct_holes_with_padding_bytes_multiple_structs(
+    cxplat, parsed_definitions
+):
+    result = parsed_definitions(
+        cxplat.xml("holes_real.xml"),
         skip_failed_parsing=True,
         remove_unknown=True,
     )
 
-    filled_defs = fill_struct_holes_with_padding_bytes(result)
+    filled_defs = index_by_name(fill_struct_holes_with_padding_bytes(result))
 
     # --- Holey Struct ---
-    holey = find_type_by_name(filled_defs, "Holey")
+    holey = filled_defs.get("Holey")
     assert holey is not None and isinstance(holey, ClassDefinition)
 
-    pads = [f for f in holey.fields if f.name.startswith("__pad")]
+    pads = [f for f in holey.fields if f.padding]
     assert pads, "Expected padding in 'Holey'"
     assert any(
         p.elements == (3,) or p.elements == () for p in pads
@@ -98,17 +108,17 @@ def test_fill_struct_holes_with_padding_bytes_multiple_structs(cxplat):
     ), "Expected 2-byte trailing padding"
 
     # --- Packed Struct ---
-    packed = find_type_by_name(filled_defs, "Packed")
+    packed = filled_defs.get("Packed")
     assert packed is not None and isinstance(packed, ClassDefinition)
     assert not any(
-        f.name.startswith("__pad") for f in packed.fields
+        f.padding for f in packed.fields
     ), "No padding should be added to 'Packed'"
 
     # --- MultiHoles Struct ---
-    multi = find_type_by_name(filled_defs, "MultiHoles")
+    multi = filled_defs.get("MultiHoles")
     assert multi is not None and isinstance(multi, ClassDefinition)
 
-    pads = [f for f in multi.fields if f.name.startswith("__pad")]
+    pads = [f for f in multi.fields if f.padding]
     assert pads, "Expected padding in 'MultiHoles'"
     assert any(
         p.size_in_bits % 8 == 0 for p in pads
@@ -119,16 +129,101 @@ def test_fill_struct_holes_with_padding_bytes_multiple_structs(cxplat):
         for field in struct.fields:
             assert isinstance(field.size_in_bits, int) and field.size_in_bits > 0
             assert not field.bitfield
-            if field.name.startswith("__pad"):
+            assert field.padding == field.name.startswith("__pad")
+            if field.padding:
                 assert field.type.fullname == "uint8_t"
                 assert isinstance(field.elements, tuple)
 
 
-def test_flatten_namespaces(cxplat):
-    result = parse(
-        os.path.join(
-            here, os.pardir, "headers", cxplat.directory, "namespaced_types.xml"
+def test_fill_holes_sorts_hole_free_structs(cxplat, parsed_definitions):
+    result = parsed_definitions(
+        cxplat.xml("holes_real.xml"),
+        skip_failed_parsing=True,
+        remove_unknown=True,
+    )
+    packed = find_type_by_name(result, "Packed")
+    reversed_packed = replace(packed, fields=packed.fields[::-1])
+
+    fillers = (fill_struct_holes_with_padding_bytes, fill_bitfield_holes_with_padding)
+    for fill in fillers:
+        (filled,) = fill([reversed_packed])
+        assert [f.name for f in filled.fields] == ["x", "y", "z"]
+        # Already sorted and hole-free: the very same definition comes back
+        assert fill([packed])[0] is packed
+
+
+def test_reorder_fields_min_padding(cxplat, parsed_definitions):
+    result = parsed_definitions(
+        cxplat.xml("holes_real.xml"),
+        skip_failed_parsing=True,
+        remove_unknown=True,
+    )
+    before = index_by_name(result)
+    after = index_by_name(reorder_fields_min_padding(result))
+
+    holey = after.get("Holey")
+    assert before.get("Holey").size == 12
+    assert holey.size == 8
+    assert [(f.name, f.bitoffset) for f in holey.fields] == [
+        ("b", 0),
+        ("c", 32),
+        ("a", 48),
+    ]
+
+    multi = after.get("MultiHoles")
+    assert before.get("MultiHoles").size == 12
+    assert multi.size == 8
+    assert [f.name for f in multi.fields] == ["d", "b", "a", "c"]
+
+    # Already tight: left exactly as parsed
+    packed = after.get("Packed")
+    assert packed is before.get("Packed")
+
+    # Padding fields store the whole pad in size_in_bits: padded structs are skipped
+    padded = fill_struct_holes_with_padding_bytes(result)
+    assert any(f.padding for d in padded for f in getattr(d, "fields", ()))
+    assert all(a is b for a, b in zip(reorder_fields_min_padding(padded), padded))
+
+    validate_definitions(list(after.values()))
+
+    # Nested: a struct embedded in another one is kept, whatever it would save
+    i8, i32 = TypeBase("int8_t"), TypeBase("int32_t")
+    inner = ClassDefinition(
+        name="Inner",
+        alignment=4,
+        size=12,
+        fields=(
+            Field("a", i8, (), 0, 8),
+            Field("b", i32, (), 32, 32),
+            Field("c", i8, (), 64, 8),
         ),
+    )
+    outer = ClassDefinition(
+        name="Outer",
+        alignment=4,
+        size=16,
+        fields=(
+            Field("i", TypeBase("Inner"), (), 0, 96),
+            Field("x", i32, (), 96, 32),
+        ),
+    )
+
+    # Inner alone shrinks to 8 bytes...
+    (alone,) = reorder_fields_min_padding([inner])
+    assert alone.size == 8
+
+    # ...but Outer embeds it, so shrinking it would contradict Outer's layout
+    result = reorder_fields_min_padding([inner, outer])
+    assert result[0] is inner and result[1] is outer
+
+    module = ModuleType("generated_module")
+    exec(generate_python_code_from_definitions(result), module.__dict__)
+    verify_struct_sizes(result, module)
+
+
+def test_flatten_namespaces(cxplat, parsed_definitions):
+    result = parsed_definitions(
+        cxplat.xml("namespaced_types.xml"),
         skip_failed_parsing=True,
         remove_unknown=True,
     )
@@ -141,11 +236,9 @@ def test_flatten_namespaces(cxplat):
     assert "Beta__Extra" in names
     assert all(d.namespace == () for d in flattened)
 
-def test_flatten_namespaces2(cxplat):
-    result = parse(
-        os.path.join(
-            here, os.pardir, "headers", cxplat.directory, "namespaces.xml"
-        ),
+def test_flatten_namespaces2(cxplat, parsed_definitions):
+    result = parsed_definitions(
+        cxplat.xml("namespaces.xml"),
         skip_failed_parsing=True,
         remove_unknown=True,
     )
@@ -161,12 +254,9 @@ def test_flatten_namespaces2(cxplat):
     validate_definitions(flattened)
 
 
-
-def test_resolve_typedefs(cxplat):
-    result = parse(
-        os.path.join(
-            here, os.pardir, "headers", cxplat.directory, "typedef_remove.xml"
-        ),
+def test_resolve_typedefs(cxplat, parsed_definitions):
+    result = parsed_definitions(
+        cxplat.xml("typedef_remove.xml"),
         skip_failed_parsing=True,
         remove_unknown=True,
     )
@@ -240,6 +330,29 @@ def test_include_as_list(sample_definitions):
     assert "A" in names and "B" in names
 
 
+def test_include_precompiled(sample_definitions):
+    by_str = filter_by_source_regexes(sample_definitions, include=r"/home/user/")
+    by_pattern = filter_by_source_regexes(
+        sample_definitions, include=re.compile(r"/home/user/")
+    )
+    assert by_pattern == by_str
+
+    # Flags on a compiled pattern are honoured
+    result = filter_by_source_regexes(
+        sample_definitions, exclude=[re.compile(r"^c:\\", re.IGNORECASE), r"^/usr/"]
+    )
+    assert [d.name for d in result] == ["B", "E"]
+
+
+def test_include_matches_per_pattern_search(sample_definitions):
+    # Fused alternations (also past the fusion cap) select what a per-pattern search does
+    patterns = [r"^/usr/", r"bar\.h$", r"(cus)tom", r"(?i)^d:"]
+    patterns += [rf"/nowhere{i}/" for i in range(100)] + [r"/home/user/"]
+    expected = [
+        d for d in sample_definitions if any(re.search(p, d.source) for p in patterns)
+    ]
+    assert filter_by_source_regexes(sample_definitions, include=patterns) == expected
+    assert filter_by_source_regexes(sample_definitions, exclude=patterns) == []
 
 
 # assumes: from yourmodule import filter_by_name_regexes
@@ -289,11 +402,9 @@ def test_name_use_fullname():
     res_exc = filter_by_name_regexes(defs, exclude=r"^internal::", use_fullname=True)
     assert all(d.name != "I" for d in res_exc)
 
-def test_filter_connected_definitions(cxplat):
-    path = os.path.join(
-        here, os.pardir, "headers", cxplat.directory, "connected_filter.xml"
-    )
-    all_defs = parse(path, skip_failed_parsing=True, remove_unknown=True)
+def test_filter_connected_definitions(cxplat, parsed_definitions):
+    path = cxplat.xml("connected_filter.xml")
+    all_defs = parsed_definitions(path, skip_failed_parsing=True, remove_unknown=True)
     validate_definitions(all_defs)
 
     # check fail if non exist
@@ -317,6 +428,19 @@ def test_filter_connected_definitions(cxplat):
     ), "Disconnected type 'Unused' should have been removed"
 
 
+def test_prebuilt_dependency_graph(cxplat, parsed_definitions):
+    path = cxplat.xml("connected_filter.xml")
+    all_defs = parsed_definitions(path, skip_failed_parsing=True, remove_unknown=True)
+
+    graph = build_type_dependency_graph(all_defs)
+    assert filter_connected_definitions(
+        all_defs, "Main", graph=graph
+    ) == filter_connected_definitions(all_defs, "Main")
+    assert sort_definitions_topologically(
+        all_defs, graph=graph
+    ) == sort_definitions_topologically(all_defs)
+
+
 HERE = Path(__file__).parent
 XML_DIR = HERE / "xml"
 
@@ -336,9 +460,9 @@ def _field_names(defn):
 # -----------------------------
 # flatten_structs manipulator
 # -----------------------------
-def test_flatten_structs_basic(cxplat):
-    path = os.path.join(here, os.pardir, "headers", cxplat.directory, "flatten.xml")
-    defs = parse(path, skip_failed_parsing=True, remove_unknown=True)
+def test_flatten_structs_basic(cxplat, parsed_definitions):
+    path = cxplat.xml("flatten.xml")
+    defs = parsed_definitions(path, skip_failed_parsing=True, remove_unknown=True)
     validate_definitions(defs)
 
     # Sanity before: Wrapper has a composite field `inner`
@@ -368,27 +492,15 @@ def test_flatten_structs_basic(cxplat):
     ), "Array field should remain unless flatten_arrays=True"
 
 
-def _get_struct(defs, name_or_suffix: str):
-    for d in defs:
-        if isinstance(d, (ClassDefinition, UnionDefinition)):
-            if d.name == name_or_suffix or d.fullname.endswith(name_or_suffix):
-                return d
-    raise AssertionError(f"Struct/union {name_or_suffix} not found")
-
-
-def _field_names(defn):
-    return [f.name for f in defn.fields]
-
-
 # -----------------------------
 # flatten_structs – extra coverage
 # -----------------------------
 
 
-def test_flatten_structs_fullname_and_separator(cxplat):
+def test_flatten_structs_fullname_and_separator(cxplat, parsed_definitions):
     """Flatten by fullname and with a custom separator."""
-    path = os.path.join(here, os.pardir, "headers", cxplat.directory, "flatten.xml")
-    defs = parse(path, skip_failed_parsing=True, remove_unknown=True)
+    path = cxplat.xml("flatten.xml")
+    defs = parsed_definitions(path, skip_failed_parsing=True, remove_unknown=True)
     validate_definitions(defs)
 
     # Use fullname (namespace)::Wrapper if present
@@ -414,15 +526,15 @@ def test_flatten_structs_fullname_and_separator(cxplat):
     assert "x" in names2 and "y" in names2
 
 
-def test_flatten_structs_arrays_offsets(cxplat):
+def test_flatten_structs_arrays_offsets(cxplat, parsed_definitions):
     """
     When flattening arrays of composites (flatten_arrays=True), we expect:
       - original array field removed
       - per-element fields with index suffixes present
       - bitoffsets differ by struct element stride (size_in_bits of Inner)
     """
-    path = os.path.join(here, os.pardir, "headers", cxplat.directory, "flatten.xml")
-    defs = parse(path, skip_failed_parsing=True, remove_unknown=True)
+    path = cxplat.xml("flatten.xml")
+    defs = parsed_definitions(path, skip_failed_parsing=True, remove_unknown=True)
     validate_definitions(defs)
 
     inner = _get_struct(defs, "Inner")
@@ -451,11 +563,10 @@ def test_flatten_structs_arrays_offsets(cxplat):
     assert off_b1 - off_b0 == inner_stride_bits, "wrong stride for items[*]__b"
 
 
+def test_flatten_nested(cxplat, parsed_definitions):
 
-def test_flatten_nested(cxplat):
-
-    path = os.path.join(here, os.pardir, "headers", cxplat.directory, "flat_nested.xml")
-    defs = parse(path, skip_failed_parsing=True, remove_unknown=True)
+    path = cxplat.xml("flat_nested.xml")
+    defs = parsed_definitions(path, skip_failed_parsing=True, remove_unknown=True)
     validate_definitions(defs)
 
     defs2 = flatten_structs(defs, targets=["A"], flatten_arrays=True)
@@ -465,18 +576,15 @@ def test_flatten_nested(cxplat):
     assert "C" not in types
 
 
-
 # -----------------------------
 # remove_enums manipulator
 # -----------------------------
-def test_remove_enums_basic(cxplat):
-    path = os.path.join(here, os.pardir, "headers", cxplat.directory, "flat_enum.xml")
-    defs = parse(path, skip_failed_parsing=True, remove_unknown=True)
+def test_remove_enums_basic(cxplat, parsed_definitions):
+    path = cxplat.xml("flat_enum.xml")
+    defs = parsed_definitions(path, skip_failed_parsing=True, remove_unknown=True)
 
     # Confirm the enum exists before transformation
-    enum_names_before = {
-        d.fullname for d in defs if d.__class__.__name__ == "EnumDefinition"
-    }
+    enum_names_before = {d.fullname for d in defs if isinstance(d, EnumDefinition)}
     assert any(
         n.endswith("Color") for n in enum_names_before
     ), "Expected an EnumDefinition 'Color' before removal"
@@ -485,9 +593,7 @@ def test_remove_enums_basic(cxplat):
     defs2 = remove_enums(defs)
 
     # All enums should be gone
-    enum_names_after = {
-        d.fullname for d in defs2 if d.__class__.__name__ == "EnumDefinition"
-    }
+    enum_names_after = {d.fullname for d in defs2 if isinstance(d, EnumDefinition)}
     assert (
         not enum_names_after
     ), f"Enum definitions remain after remove_enums: {enum_names_after}"
@@ -520,9 +626,11 @@ def test_remove_enums_basic(cxplat):
         ("flat_enum.xml", "UsesColor"),
     ],
 )
-def test_remove_source_default_empties_source(cxplat, xml_name, struct_name):
-    path = os.path.join(here, os.pardir, "headers", cxplat.directory, xml_name)
-    defs = parse(path, skip_failed_parsing=True, remove_unknown=True)
+def test_remove_source_default_empties_source(
+    cxplat, xml_name, struct_name, parsed_definitions
+):
+    path = cxplat.xml(xml_name)
+    defs = parsed_definitions(path, skip_failed_parsing=True, remove_unknown=True)
     validate_definitions(defs)
 
     target = _get_struct(defs, struct_name)
@@ -542,9 +650,11 @@ def test_remove_source_default_empties_source(cxplat, xml_name, struct_name):
         ("flat_enum.xml", "UsesColor"),
     ],
 )
-def test_remove_source_header_only_keeps_basename(cxplat, xml_name, struct_name):
-    path = os.path.join(here, os.pardir, "headers", cxplat.directory, xml_name)
-    defs = parse(path, skip_failed_parsing=True, remove_unknown=True)
+def test_remove_source_header_only_keeps_basename(
+    cxplat, xml_name, struct_name, parsed_definitions
+):
+    path = cxplat.xml(xml_name)
+    defs = parsed_definitions(path, skip_failed_parsing=True, remove_unknown=True)
     validate_definitions(defs)
 
     target = _get_struct(defs, struct_name)
@@ -1,27 +1,23 @@
-import os
-import tempfile
-import importlib.util
+import types
 import pytest
 
 from hida import (
-    parse,
     validate_definitions,
     filter_by_source_regexes,
     generate_python_code_from_definitions,
-    write_code_to_file,
     verify_struct_sizes,
     ClassDefinition,
     UnionDefinition,
     get_system_include_regexes,
 )
 
-
-here = os.path.dirname(__file__)
+_SYS_EXCLUDE = tuple(get_system_include_regexes())
 
 
 def load_and_verify_header(
     header_basename: str,
     cxplat,
+    parsed_definitions,
     use_bool=True,
     skip_failed_parsing=True,
     remove_unknown=True,
@@ -29,10 +25,8 @@ def load_and_verify_header(
     """
     Loads, converts, and verifies a header by its base XML filename.
     """
-    header_path = os.path.join(
-        here, os.pardir, "headers", cxplat.directory, header_basename
-    )
-    result = parse(
+    header_path = cxplat.xml(header_basename)
+    result = parsed_definitions(
         header_path,
         use_bool=use_bool,
         skip_failed_parsing=skip_failed_parsing,
@@ -41,29 +35,21 @@ def load_and_verify_header(
 
     assert isinstance(result, list), f"{header_basename} parsing did not return a list"
 
-    result = filter_by_source_regexes(result, exclude=get_system_include_regexes())
+    result = filter_by_source_regexes(result, exclude=_SYS_EXCLUDE)
 
     validate_definitions(result)
 
     code = generate_python_code_from_definitions(result, assert_size=cxplat.native)
 
-    with tempfile.TemporaryDirectory() as tmpdir:
-        py_file = os.path.join(tmpdir, "generated.py")
-        write_code_to_file(code, py_file)
-
-        spec = importlib.util.spec_from_file_location("generated_module", py_file)
-        module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
+    # Execute in memory rather than importing from a temp file
+    module = types.ModuleType("generated_module")
+    exec(compile(code, f"<generated {header_basename}>", "exec"), module.__dict__)
 
-        if cxplat.native:
-            verify_struct_sizes(
-                [
-                    d
-                    for d in result
-                    if isinstance(d, (ClassDefinition, UnionDefinition))
-                ],
-                module,
-            )
+    if cxplat.native:
+        verify_struct_sizes(
+            (d for d in result if isinstance(d, (ClassDefinition, UnionDefinition))),
+            module,
+        )
 
     return result  # Optionally return parsed result
 
@@ -94,5 +80,5 @@ def load_and_verify_header(
         "complicated.xml",
     ],
 )
-def test_header_xml_to_python_and_verify(filename, cxplat):
-    load_and_verify_header(filename, cxplat)
+def test_header_xml_to_python_and_verify(filename, cxplat, parsed_definitions):
+    load_and_verify_header(filename, cxplat, parsed_definitions)